@@ -0,0 +1,160 @@
+"""Time and peak memory of the taxi feature stage, before and after taxi_ingest.trip_features.
+
+    python bench_features.py --rows 7000000
+
+writes a synthetic month in the 18 columns of yellow_tripdata_2019-01.csv
+and runs both versions in a fresh process. ``before`` is the code the
+script had: the whole CSV, pd.to_datetime without a format, data.copy()
+and the unix seconds by Timestamp subtraction. ``stage MiB`` is the
+tracemalloc peak of the feature stage alone, ``peak MiB`` the peak RSS of
+the read and the stage together.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import taxi_ingest
+from common import filter_spec
+
+RAW_COLUMNS = ['VendorID', 'tpep_pickup_datetime', 'tpep_dropoff_datetime', 'passenger_count', 'trip_distance',
+               'RatecodeID', 'store_and_fwd_flag', 'PULocationID', 'DOLocationID', 'payment_type', 'fare_amount',
+               'extra', 'mta_tax', 'tip_amount', 'tolls_amount', 'improvement_surcharge', 'total_amount',
+               'congestion_surcharge']
+
+
+def synthetic_trips(path, rows, seed=42, chunk_rows=1000000):
+    """A month of trips in the layout of the 2019 yellow taxi files, written in chunks."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2019-01-01T00:00:00', 's')
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        pickup = start + rng.integers(0, 31 * 86400, n).astype('timedelta64[s]')
+        dropoff = pickup + rng.integers(-30, 5000, n).astype('timedelta64[s]')
+        fare = np.round(2.5 + rng.gamma(2, 5, n) - rng.random(n) * 0.3, 2)
+        chunk = pd.DataFrame({
+            'VendorID': rng.integers(1, 3, n),
+            'tpep_pickup_datetime': np.char.replace(np.datetime_as_string(pickup), 'T', ' '),
+            'tpep_dropoff_datetime': np.char.replace(np.datetime_as_string(dropoff), 'T', ' '),
+            'passenger_count': rng.integers(1, 7, n),
+            'trip_distance': np.round(rng.exponential(3, n) + 0.2, 2),
+            'RatecodeID': rng.choice([1, 2, 3, 5, 99], n, p=[0.97, 0.02, 0.004, 0.005, 0.001]),
+            'store_and_fwd_flag': 'N',
+            'PULocationID': rng.integers(1, 266, n),
+            'DOLocationID': rng.integers(1, 266, n),
+            'payment_type': rng.choice([1, 2, 3, 4], n, p=[0.7, 0.28, 0.015, 0.005]),
+            'fare_amount': fare,
+            'extra': 0.5, 'mta_tax': 0.5, 'tip_amount': np.round(fare * 0.15, 2), 'tolls_amount': 0.0,
+            'improvement_surcharge': 0.3, 'total_amount': np.round(fare * 1.15 + 1.3, 2), 'congestion_surcharge': 0.0,
+        })
+        chunk[RAW_COLUMNS].to_csv(path, index=False, header=offset == 0, mode='w' if offset == 0 else 'a')
+
+
+def read_before(path):
+    data = pd.read_csv(path)
+    return data[taxi_ingest.COLUMNS]
+
+
+def features_before(data):
+    # the feature stage of ny_yellow_taxi_2019.py before trip_features
+    data['trip_distance'] = (data['trip_distance'] * 1.609344).round(decimals=2)  # getting KM
+    data = filter_spec.apply(data, taxi_ingest.TRIP_FILTERS, 'yellow taxi trips')
+    data['tpep_pickup_datetime'] = pd.to_datetime(data['tpep_pickup_datetime'])
+    data['tpep_dropoff_datetime'] = pd.to_datetime(data['tpep_dropoff_datetime'])
+    data['trip_time'] = data['tpep_dropoff_datetime'] - data['tpep_pickup_datetime']
+    data_unix = data.copy()
+    data_unix['tpep_pickup_datetime'] = (data_unix['tpep_pickup_datetime'] - pd.Timestamp("1970-01-01")) // pd.Timedelta('1s')
+    data_unix['tpep_dropoff_datetime'] = (data_unix['tpep_dropoff_datetime'] - pd.Timestamp("1970-01-01")) // pd.Timedelta('1s')
+    data_unix['trip_time'] = data_unix['tpep_dropoff_datetime'] - data_unix['tpep_pickup_datetime']
+    data_unix['distance/time'] = data_unix['trip_distance'] / data_unix['trip_time']
+    # the script keeps both frames
+    return data_unix, data
+
+
+def read_after(path):
+    return pd.read_csv(path, usecols=taxi_ingest.COLUMNS, dtype=taxi_ingest.DTYPES)
+
+
+def features_after(data):
+    return taxi_ingest.trip_features(data, 'yellow taxi trips'),
+
+
+VERSIONS = {'before': (read_before, features_before), 'after': (read_after, features_after)}
+
+
+def peak_mib():
+    # VmHWM starts over with exec, ru_maxrss keeps the peak of the parent
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_version(name, path):
+    read, features = VERSIONS[name]
+    started = time.perf_counter()
+    data = read(path)
+    read_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    frames = features(data)
+    seconds = time.perf_counter() - started
+    peak = peak_mib()
+    result = {'version': name, 'rows': len(frames[0]), 'read_seconds': read_seconds, 'seconds': seconds,
+              'peak_mib': peak, 'frame_mib': sum(frame.memory_usage(deep=True).sum() for frame in frames) / 2 ** 20}
+    del data, frames
+    # once more for what the stage itself allocates, tracemalloc slows it down
+    data = read(path)
+    tracemalloc.start()
+    frames = features(data)
+    result['stage_mib'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=7000000, help="trips of the synthetic month")
+    parser.add_argument('--csv', help="existing month to read instead of a synthetic one")
+    parser.add_argument('--run', choices=sorted(VERSIONS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        return run_version(args.run, args.csv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp, 'yellow_tripdata_2019-01.csv')
+            synthetic_trips(path, args.rows)
+        print("%s: %.0f MiB" % (path, os.path.getsize(path) / 2 ** 20))
+        results = []
+        for name in VERSIONS:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name, '--csv', path],
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.splitlines()[-1]))
+    print("%-8s %10s %10s %10s %12s %12s %12s" % ('version', 'trips', 'read s', 'stage s', 'stage MiB',
+                                                  'peak MiB', 'frames MiB'))
+    for result in results:
+        print("%-8s %10d %10.2f %10.2f %12.1f %12.1f %12.1f"
+              % (result['version'], result['rows'], result['read_seconds'], result['seconds'], result['stage_mib'],
+                 result['peak_mib'], result['frame_mib']))
+    before, after = results
+    print("feature stage: %.1fx faster, allocates %.1fx less; whole run: %.1fx less peak memory"
+          % (before['seconds'] / after['seconds'], before['stage_mib'] / after['stage_mib'],
+             before['peak_mib'] / after['peak_mib']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Parquet cache of the cleaned yellow taxi trips.
+
+``convert`` runs the cleaning of taxi_ingest once per monthly CSV and
+writes the trips under CACHE_DIR, one Parquet dataset per source file,
+partitioned by pickup month and hour::
+
+    taxi_cache/<key>/month=2019-01/hour=7/part.0.parquet
+
+The manifest (CACHE_DIR/manifest.json) maps every source file to its key,
+the hash of the file, the filters, the dtypes and VERSION, so a changed
+file or filter is converted again and an unchanged one never is. ``load``
+reads only the partitions of the months and hours asked for and only the
+columns asked for:
+
+    python taxi_cache.py "D:/Coding_data/yellow_tripdata_2019-*.csv" --months 2019-03 --hours 7 8 9
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import taxi_ingest
+
+CACHE_DIR = os.environ.get('TAXI_CACHE_DIR', 'taxi_cache')
+MANIFEST = 'manifest.json'
+# part of every key, bump it when the cleaning changes
+VERSION = 3
+
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string()), ('hour', pa.int8())]), flavor='hive')
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'sources': {}}
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def source_key(digest):
+    payload = json.dumps([VERSION, digest, taxi_ingest.TRIP_FILTERS, taxi_ingest.DTYPES], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _partition_columns(data):
+    pickup = data['tpep_pickup_datetime'].to_numpy()
+    return data.assign(month=pickup.astype('datetime64[s]').astype('datetime64[M]').astype(str),
+                       hour=(pickup % 86400 // 3600).astype(np.int8))
+
+
+def _convert_file(path, target, workers):
+    trips = taxi_ingest.read_trips(path)
+    trips = trips.map_partitions(_partition_columns, meta=_partition_columns(trips._meta))
+    with taxi_ingest.scheduler(workers):
+        trips.to_parquet(target, partition_on=['month', 'hour'], write_index=False, write_metadata_file=False)
+
+
+def convert(pattern, directory=CACHE_DIR, workers=None):
+    """Cache every file matching ``pattern`` that is not cached yet, the dataset directories of all of them."""
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise FileNotFoundError("no taxi files match %s" % pattern)
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(directory)
+    datasets = []
+    for path in paths:
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = manifest['sources'].get(os.path.abspath(path), {})
+        # the hash is only taken again when size or mtime changed
+        digest = entry['sha256'] if entry.get('signature') == signature else file_hash(path)
+        key = source_key(digest)
+        target = os.path.join(directory, key)
+        if entry.get('key') != key or not os.path.isdir(target):
+            print("--- Caching %s ---" % path)
+            shutil.rmtree(target + '.tmp', ignore_errors=True)
+            _convert_file(path, target + '.tmp', workers)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(target + '.tmp', target)
+            previous = entry.get('key')
+            if previous and previous != key and all(other.get('key') != previous for source, other
+                                                     in manifest['sources'].items() if source != os.path.abspath(path)):
+                shutil.rmtree(os.path.join(directory, previous), ignore_errors=True)
+        manifest['sources'][os.path.abspath(path)] = {'signature': signature, 'sha256': digest, 'key': key}
+        # written after every file, an interrupted conversion keeps the finished ones
+        _write_manifest(directory, manifest)
+        datasets.append(target)
+    return datasets
+
+
+def load(pattern, months=None, hours=None, columns=None, directory=CACHE_DIR, workers=None):
+    """The cleaned trips of ``pattern`` in the pickup ``months`` ('2019-01') and ``hours`` (0-23), all by default.
+
+    Files that are not cached yet are converted first. Only the partitions
+    and ``columns`` asked for are read, into a pandas frame that shares the
+    Arrow buffers where the dtypes allow it.
+    """
+    datasets = [ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+                for path in convert(pattern, directory, workers)]
+    dataset = ds.dataset(datasets)
+    selection = None
+    for name, values in (('month', months), ('hour', hours)):
+        if values is not None:
+            condition = ds.field(name).isin(list(values))
+            selection = condition if selection is None else selection & condition
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in PARTITIONING.schema.names]
+    table = dataset.to_table(columns=list(columns), filter=selection)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache the cleaned yellow taxi trips as partitioned Parquet.")
+    parser.add_argument('pattern', help="e.g. 'yellow_tripdata_2019-*.csv', quoted")
+    parser.add_argument('--months', nargs='+', help="pickup months to load, e.g. 2019-01")
+    parser.add_argument('--hours', nargs='+', type=int, help="pickup hours to load, 0-23")
+    parser.add_argument('--columns', nargs='+', help="columns to load")
+    parser.add_argument('--workers', type=int, default=None, help="processes converting a file, all cores by default")
+    args = parser.parse_args()
+    trips = load(args.pattern, args.months, args.hours, args.columns, workers=args.workers)
+    print(trips.head())
+    print("%d trips, %.2f MiB" % (len(trips), trips.memory_usage(deep=True).sum() / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
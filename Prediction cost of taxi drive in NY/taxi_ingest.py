@@ -0,0 +1,166 @@
+"""Out-of-core ingestion of the NYC yellow taxi trips.
+
+``read_trips`` reads a glob of monthly files (yellow_tripdata_2019-*.csv)
+as one partitioned Dask dataframe. Only the 8 columns of
+ny_yellow_taxi_2019.py are parsed, with compact dtypes, and every
+partition is cleaned and gets its features on its own, so no step needs
+more than a few partitions in memory:
+
+    python taxi_ingest.py "D:/Coding_data/yellow_tripdata_2019-*.csv" --workers 4
+
+prints the trips per month of a whole year on the local multi-process
+scheduler. ``load`` materializes the cleaned trips, or a sample of them,
+for the model part of the script.
+"""
+import argparse
+import logging
+import os
+import sys
+
+import dask
+import dask.dataframe as dd
+import numpy as np
+import pandas as pd
+from dask.diagnostics import ProgressBar
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common import filter_spec
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['tpep_pickup_datetime', 'tpep_dropoff_datetime', 'trip_distance', 'RatecodeID', 'PULocationID',
+           'DOLocationID', 'payment_type', 'fare_amount']
+
+# RatecodeID and payment_type are missing in some months, so floats; distance stays float64 until it is in km
+DTYPES = {
+    'tpep_pickup_datetime': object,
+    'tpep_dropoff_datetime': object,
+    'trip_distance': 'float64',
+    'RatecodeID': 'float32',
+    'PULocationID': 'uint16',
+    'DOLocationID': 'uint16',
+    'payment_type': 'float32',
+    'fare_amount': 'float32',
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# epoch_seconds of a missing timestamp
+NAT = np.datetime64('NaT').view(np.int64)
+
+# unknown zones 264 & 265 and zone 1 (Newark Airport) are thrown out, trip_distance in km
+TRIP_FILTERS = [
+    ('PULocationID', '!=', 1),
+    ('DOLocationID', '!=', 1),
+    ('PULocationID', '<', 264),
+    ('DOLocationID', '<', 264),
+    ('RatecodeID', '==', 1),
+    ('fare_amount', '>', 0),
+    ('trip_distance', '>=', 0.5),
+    ('trip_distance', '<', 100),
+    ('fare_amount', '<', 150),
+    ('fare_amount', '>=', 2.5),
+    ('payment_type', '<=', 2),
+]
+
+# 64 MB of CSV is about 600k trips
+BLOCKSIZE = os.environ.get('TAXI_BLOCKSIZE', '64MB')
+
+
+def epoch_seconds(timestamps):
+    """Unix seconds of timestamp strings in TIMESTAMP_FORMAT, int64.
+
+    numpy reads that layout straight into datetime64[s], the seconds are
+    its int64 view; other strings go through pd.to_datetime with the format.
+    """
+    timestamps = np.asarray(timestamps, dtype=object)
+    try:
+        parsed = timestamps.astype('datetime64[s]')
+    except ValueError:
+        parsed = pd.to_datetime(timestamps, format=TIMESTAMP_FORMAT).to_numpy(dtype='datetime64[s]')
+    return parsed.view(np.int64)
+
+
+def trip_features(data, name=None):
+    """The trips of the raw COLUMNS ``data`` that pass TRIP_FILTERS, with the features of data_unix.
+
+    Every column is built once: the km are rounded in place, only the
+    timestamps of the kept trips are parsed, trip_time and distance/time
+    end up as int32 and float32 arrays. Trips with a missing or broken
+    timestamp are dropped. ``name`` logs what the filters and the
+    timestamps rejected.
+    """
+    km = data['trip_distance'].to_numpy(dtype=np.float64, copy=True)
+    np.multiply(km, 1.609344, out=km)
+    np.round(km, 2, out=km)  # getting KM
+    # the filters see the km in float64, as before
+    keep, rejected = filter_spec.compile_mask(data.assign(trip_distance=km), TRIP_FILTERS)
+    if name:
+        filter_spec.report(name, TRIP_FILTERS, len(data), int(np.count_nonzero(keep)), rejected)
+    rows = np.flatnonzero(keep)
+    pickup = epoch_seconds(data['tpep_pickup_datetime'].to_numpy()[rows])
+    dropoff = epoch_seconds(data['tpep_dropoff_datetime'].to_numpy()[rows])
+    # a missing timestamp is NaT, a trip longer than int32 seconds (68 years) has a broken one
+    valid = (pickup != NAT) & (dropoff != NAT)
+    trip_time = np.subtract(dropoff, pickup, where=valid, out=np.zeros(len(rows), dtype=np.int64))
+    valid &= np.abs(trip_time) <= np.iinfo(np.int32).max
+    if not valid.all():
+        if name:
+            logger.info("%s: dropped %d trips with a missing or broken timestamp", name, len(valid) - valid.sum())
+        rows, pickup, dropoff, trip_time = rows[valid], pickup[valid], dropoff[valid], trip_time[valid]
+    trip_time = trip_time.astype(np.int32)
+    km = km[rows]
+    speed = np.empty(len(km), dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(km, trip_time, out=speed, casting='same_kind')  # lin correlations close zero
+    columns = {'tpep_pickup_datetime': pickup, 'tpep_dropoff_datetime': dropoff,
+               'trip_distance': km.astype(np.float32)}
+    for column in COLUMNS[3:]:
+        columns[column] = data[column].to_numpy()[rows]
+    columns['trip_time'] = trip_time
+    columns['distance/time'] = speed
+    return pd.DataFrame(columns, index=data.index[rows], copy=False)
+
+
+def read_trips(pattern, blocksize=BLOCKSIZE):
+    """Cleaned trips of all files matching ``pattern``, lazily, one partition per ``blocksize`` of CSV."""
+    raw = dd.read_csv(pattern, usecols=COLUMNS, dtype=DTYPES, blocksize=blocksize)
+    empty = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in DTYPES.items()})[COLUMNS]
+    return raw.map_partitions(trip_features, meta=trip_features(empty))
+
+
+def scheduler(workers=None):
+    """Context of the local multi-process scheduler with ``workers`` processes."""
+    return dask.config.set(scheduler='processes', num_workers=workers or os.cpu_count())
+
+
+def load(pattern, sample=1.0, workers=None, blocksize=BLOCKSIZE, random_state=42):
+    """The cleaned trips as one pandas frame, ``sample`` of them if a year does not fit in memory."""
+    trips = read_trips(pattern, blocksize)
+    if sample < 1:
+        trips = trips.sample(frac=sample, random_state=random_state)
+    with scheduler(workers), ProgressBar():
+        return trips.compute()
+
+
+def monthly_summary(pattern, workers=None, blocksize=BLOCKSIZE):
+    """Trips, mean fare, mean km and mean trip time per pickup month, only the aggregates are collected."""
+    trips = read_trips(pattern, blocksize)
+    month = dd.to_datetime(trips['tpep_pickup_datetime'], unit='s').dt.strftime('%Y-%m')
+    summary = trips.assign(month=month).groupby('month').agg(
+        trips=('fare_amount', 'count'), fare_amount=('fare_amount', 'mean'),
+        trip_distance=('trip_distance', 'mean'), trip_time=('trip_time', 'mean'))
+    with scheduler(workers), ProgressBar():
+        return summary.compute().sort_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean a glob of monthly yellow taxi files out of core.")
+    parser.add_argument('pattern', help="e.g. 'yellow_tripdata_2019-*.csv', quoted")
+    parser.add_argument('--workers', type=int, default=None, help="processes of the scheduler, all cores by default")
+    parser.add_argument('--blocksize', default=BLOCKSIZE, help="CSV bytes per partition, bounds the memory per worker")
+    args = parser.parse_args()
+    print(monthly_summary(args.pattern, args.workers, args.blocksize))
+
+
+if __name__ == '__main__':
+    main()
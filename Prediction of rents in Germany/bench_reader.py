@@ -0,0 +1,174 @@
+"""Parse time and peak memory of the full immo_data.csv read versus the streaming reader.
+
+    python bench_reader.py --rows 268850
+
+writes a synthetic file with the 49 columns of the ImmoScout dataset
+(including the long description and facilities texts) and runs every
+reader in a fresh process, so the peak memory is that of the reader alone.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import housing_pipeline
+from common import filter_spec
+
+LANDS = list(housing_pipeline.REGIO1_TO_NUMS)
+WORDS = ("Wohnung Balkon hell ruhig Lage Küche Bad renoviert Altbau Neubau Parkett Zimmer "
+         "Keller Aufzug Garten zentral Einkaufsmöglichkeiten Nähe Bus Bahn Schule Kita").split()
+
+
+def _text(rng, rows, words):
+    vocabulary = np.array(WORDS)
+    return [' '.join(vocabulary[rng.integers(0, len(vocabulary), words)]) for _ in range(rows)]
+
+
+def synthetic_immo(path, rows, seed=42):
+    """A CSV in the column order and with the kinds of values of immo_data.csv."""
+    rng = np.random.default_rng(seed)
+
+    def maybe(values, missing=0.2):
+        values = np.asarray(values, dtype=object)
+        values[rng.random(rows) < missing] = None
+        return values
+
+    def choice(options, missing=0.2):
+        return maybe(rng.choice(options, rows), missing)
+
+    def number(low, high, missing=0.2, decimals=2):
+        return maybe(np.round(rng.uniform(low, high, rows), decimals), missing)
+
+    def whole(low, high, missing=0.2):
+        return maybe(rng.integers(low, high, rows), missing)
+
+    flags = lambda: rng.random(rows) < 0.5
+    lands = rng.choice(LANDS, rows)
+    columns = {
+        'regio1': lands,
+        'serviceCharge': number(0, 500),
+        'heatingType': choice(['central_heating', 'district_heating', 'gas_heating', 'self_contained_central_heating']),
+        'telekomTvOffer': choice(['ONE_YEAR_FREE', 'NONE', 'ON_DEMAND']),
+        'telekomHybridUploadSpeed': choice([10.0], 0.8),
+        'newlyConst': flags(),
+        'balcony': flags(),
+        'picturecount': rng.integers(0, 40, rows),
+        'pricetrend': number(-5, 10, 0.01),
+        'telekomUploadSpeed': choice([1.0, 2.4, 10.0, 40.0]),
+        'totalRent': number(100, 4000, 0.15),
+        'yearConstructed': whole(1800, 2021),
+        'scoutId': rng.integers(10 ** 8, 2 * 10 ** 8, rows),
+        'noParkSpaces': whole(0, 5, 0.6),
+        'firingTypes': choice(['oil', 'gas', 'district_heating', 'electricity']),
+        'hasKitchen': flags(),
+        'geo_bln': lands,
+        'cellar': flags(),
+        'yearConstructedRange': whole(1, 10),
+        'baseRent': np.round(rng.lognormal(6.4, 0.5, rows), 2),
+        'houseNumber': whole(1, 200, 0.3),
+        'livingSpace': np.round(rng.lognormal(4.1, 0.4, rows), 2),
+        'geo_krs': rng.choice(['Dortmund', 'Rhein_Erft_Kreis', 'Dresden', 'Mittelsachsen_Kreis', 'Bremen'], rows),
+        'condition': choice(['well_kept', 'refurbished', 'first_time_use', 'mint_condition']),
+        'interiorQual': choice(['normal', 'sophisticated', 'luxury', 'simple']),
+        'petsAllowed': choice(['yes', 'no', 'negotiable'], 0.4),
+        'street': choice(['Sch&uuml;lerweg', 'Hauptstra&szlig;e', 'Bahnhofstr.'], 0.3),
+        'streetPlain': choice(['Schülerweg', 'Hauptstraße', 'Bahnhofstr.'], 0.3),
+        'lift': flags(),
+        'baseRentRange': rng.integers(1, 10, rows),
+        'typeOfFlat': choice(['apartment', 'roof_storey', 'ground_floor', 'maisonette']),
+        'geo_plz': rng.integers(1000, 99999, rows),
+        'noRooms': rng.choice([1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 6, 8], rows),
+        'thermalChar': number(20, 300, 0.4, 1),
+        'floor': whole(-1, 25),
+        'numberOfFloors': whole(1, 25, 0.35),
+        'noRoomsRange': rng.integers(1, 5, rows),
+        'garden': flags(),
+        'livingSpaceRange': rng.integers(1, 7, rows),
+        'regio2': rng.choice(['Dortmund', 'Rhein_Erft_Kreis', 'Dresden', 'Mittelsachsen_Kreis', 'Bremen'], rows),
+        'regio3': rng.choice(['Schüren', 'Böblingen', 'Äußere_Neustadt_Antonstadt', 'Innenstadt'], rows),
+        'description': maybe(_text(rng, rows, 120), 0.07),
+        'facilities': maybe(_text(rng, rows, 50), 0.2),
+        'heatingCosts': number(0, 200, 0.7),
+        'energyEfficiencyClass': choice(['A', 'B', 'C', 'D', 'E'], 0.7),
+        'lastRefurbish': whole(1950, 2022, 0.7),
+        'electricityBasePrice': choice([90.76, 90.76], 0.8),
+        'electricityKwhPrice': choice([0.2109, 0.1985], 0.8),
+        'date': rng.choice(['May19', 'Oct19', 'Sep18', 'Feb20'], rows),
+    }
+    pd.DataFrame(columns).to_csv(path, index=False)
+
+
+def full_read(path):
+    # what read_housing() and drop_columns() did before the streaming reader
+    data = pd.read_csv(path, dtype=housing_pipeline.READ_DTYPES)
+    data = data.drop(housing_pipeline.LESS_COLUMNS, axis=1)
+    return filter_spec.apply(data, housing_pipeline.FILTERS)
+
+
+def streaming_read(path):
+    housing_pipeline.SOURCE = path
+    return housing_pipeline.drop_stage(housing_pipeline.STAGES['drop'][2])
+
+
+READERS = {'full': full_read, 'streaming': streaming_read}
+
+
+def peak_mib():
+    # VmHWM starts over with exec, ru_maxrss keeps the peak of the parent
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_reader(name, path):
+    started = time.perf_counter()
+    data = READERS[name](path)
+    seconds = time.perf_counter() - started
+    print(json.dumps({'reader': name, 'seconds': seconds, 'rows': len(data), 'peak_mib': peak_mib(),
+                      'frame_mib': data.memory_usage(deep=True).sum() / 2 ** 20}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=268850, help="rows of the synthetic file")
+    parser.add_argument('--csv', help="existing file to read instead of a synthetic one")
+    parser.add_argument('--run', choices=sorted(READERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        return run_reader(args.run, args.csv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = os.path.join(tmp, 'immo_data.csv')
+            synthetic_immo(path, args.rows)
+        print("%s: %.0f MiB" % (path, os.path.getsize(path) / 2 ** 20))
+        results = []
+        for name in READERS:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name, '--csv', path],
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.splitlines()[-1]))
+    print("%-10s %10s %10s %12s %12s" % ('reader', 'rows', 'seconds', 'peak MiB', 'frame MiB'))
+    for result in results:
+        print("%-10s %10d %10.2f %12.1f %12.1f" % (result['reader'], result['rows'], result['seconds'],
+                                                   result['peak_mib'], result['frame_mib']))
+    full, streaming = results
+    print("streaming: %.1fx faster, %.1fx less peak memory"
+          % (full['seconds'] / streaming['seconds'], full['peak_mib'] / streaming['peak_mib']))
+
+
+if __name__ == '__main__':
+    main()
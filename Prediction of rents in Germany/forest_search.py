@@ -0,0 +1,237 @@
+"""Grid search for forests that grows the trees of a setting only once.
+
+``GridSearchCV`` fits a new forest for every ``n_estimators`` of the grid,
+so the forests of 3, 10 and 30 trees build the first 3 trees three times.
+``WarmStartForestSearch`` groups the candidates that only differ in
+``n_estimators``, grows one forest per group and fold with ``warm_start``
+and scores it at every ``n_estimators`` of the group. With a fixed
+``random_state`` the trees are the ones a fresh fit would build, so the
+scores are those of ``GridSearchCV``.
+
+With ``halving=True`` all candidates are scored on the first folds only
+and the best ``1 / factor`` of them go on to more folds, until the
+survivors have seen every fold.
+
+The fitted search has ``cv_results_``, ``best_index_``, ``best_params_``,
+``best_score_`` and, with ``refit=True``, ``best_estimator_`` as in
+``GridSearchCV``. Candidates eliminated by halving have NaN for the folds
+they were not scored on and rank after all complete candidates.
+
+    python forest_search.py --halving
+
+compares it with the ``GridSearchCV`` of housing_de.py.
+"""
+import argparse
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, check_cv
+
+
+# X, y, folds and scorer of this worker process, set once by _init_worker
+_data = None
+
+
+def _init_worker(X, y, folds, scorer):
+    global _data
+    _data = (X, y, folds, scorer)
+
+
+def _grow(estimator, params, checkpoints, fold, train_score):
+    """Grow one forest through ``checkpoints`` trees on ``fold``, the scores and timings at every checkpoint."""
+    X, y, folds, scorer = _data
+    train, test = folds[fold]
+    forest = clone(estimator).set_params(warm_start=True, **params)
+    results = []
+    for n_estimators in checkpoints:
+        started = time.perf_counter()
+        forest.set_params(n_estimators=n_estimators)
+        forest.fit(X[train], y[train])
+        fit_time = time.perf_counter() - started
+        started = time.perf_counter()
+        test_score = scorer(forest, X[test], y[test])
+        score_time = time.perf_counter() - started
+        results.append((n_estimators, test_score, scorer(forest, X[train], y[train]) if train_score else np.nan,
+                        fit_time, score_time))
+    return fold, results
+
+
+class WarmStartForestSearch:
+    """Exhaustive or successive-halving search over a forest's ``param_grid``, growing forests with warm_start.
+
+    ``fit_time`` of a candidate is the time of growing its forest from the
+    previous checkpoint of its group, the work the search actually did.
+    """
+
+    def __init__(self, estimator, param_grid, scoring=None, cv=5, refit=True, return_train_score=False,
+                 halving=False, factor=3, min_folds=2, n_jobs=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.refit = refit
+        self.return_train_score = return_train_score
+        self.halving = halving
+        self.factor = factor
+        self.min_folds = min_folds
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        X, y = np.asarray(X), np.asarray(y)
+        cv = check_cv(self.cv, y, classifier=is_classifier(self.estimator))
+        folds = list(cv.split(X, y))
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        candidates = list(ParameterGrid(self.param_grid))
+        default_trees = self.estimator.get_params()['n_estimators']
+        # group: the parameters without n_estimators -> indexes of its candidates
+        groups = {}
+        for index, params in enumerate(candidates):
+            key = tuple(sorted((name, repr(value)) for name, value in params.items() if name != 'n_estimators'))
+            groups.setdefault(key, []).append(index)
+        trees = [params.get('n_estimators', default_trees) for params in candidates]
+
+        n_splits = len(folds)
+        test_scores = np.full((len(candidates), n_splits), np.nan)
+        train_scores = np.full((len(candidates), n_splits), np.nan)
+        fit_times = np.full((len(candidates), n_splits), np.nan)
+        score_times = np.full((len(candidates), n_splits), np.nan)
+        estimator = self.estimator
+        if self.n_jobs != 1 and 'n_jobs' in estimator.get_params():
+            # the pool already uses every core
+            estimator = clone(estimator).set_params(n_jobs=1)
+
+        alive = list(range(len(candidates)))
+        done = 0
+        target = min(self.min_folds, n_splits) if self.halving else n_splits
+        self.n_trees_ = 0
+        with ProcessPoolExecutor(self.n_jobs if self.n_jobs and self.n_jobs > 0 else None,
+                                 initializer=_init_worker, initargs=(X, y, folds, scorer)) as pool:
+            while True:
+                # future -> n_estimators -> the candidates scored at that checkpoint
+                futures = {}
+                for indexes in groups.values():
+                    living = [index for index in indexes if index in alive]
+                    if not living:
+                        continue
+                    params = {name: value for name, value in candidates[living[0]].items() if name != 'n_estimators'}
+                    at = {}
+                    for index in living:
+                        at.setdefault(trees[index], []).append(index)
+                    checkpoints = sorted(at)
+                    for fold in range(done, target):
+                        future = pool.submit(_grow, estimator, params, checkpoints, fold, self.return_train_score)
+                        futures[future] = at
+                        self.n_trees_ += checkpoints[-1]
+                for future in as_completed(futures):
+                    fold, results = future.result()
+                    for n_estimators, test_score, train_score, fit_time, score_time in results:
+                        for index in futures[future][n_estimators]:
+                            test_scores[index, fold] = test_score
+                            train_scores[index, fold] = train_score
+                            fit_times[index, fold] = fit_time
+                            score_times[index, fold] = score_time
+                done = target
+                if done >= n_splits:
+                    break
+                keep = max(1, math.ceil(len(alive) / self.factor))
+                # stable sort, ties keep the grid order
+                ranked = sorted(alive, key=lambda index: -test_scores[index, :done].mean())
+                alive = sorted(ranked[:keep])
+                target = min(n_splits, done * self.factor)
+
+        self.cv_results_ = self._results(candidates, test_scores, train_scores, fit_times, score_times)
+        self.n_splits_ = n_splits
+        self.best_index_ = int(self.cv_results_['rank_test_score'].argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+        self.scorer_ = scorer
+        if self.refit:
+            started = time.perf_counter()
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+            self.refit_time_ = time.perf_counter() - started
+        return self
+
+    @staticmethod
+    def _grid_keys(candidates):
+        return set().union(*candidates) if candidates else set()
+
+    def _results(self, candidates, test_scores, train_scores, fit_times, score_times):
+        results = {}
+        for name in sorted(self._grid_keys(candidates)):
+            values = np.ma.MaskedArray(np.empty(len(candidates), dtype=object), mask=True)
+            for index, params in enumerate(candidates):
+                if name in params:
+                    values[index] = params[name]
+            results['param_%s' % name] = values
+        results['params'] = candidates
+        complete = ~np.isnan(test_scores).any(axis=1)
+        for prefix, scores in (('test', test_scores), ('train', train_scores)):
+            if prefix == 'train' and not self.return_train_score:
+                continue
+            for fold in range(scores.shape[1]):
+                results['split%d_%s_score' % (fold, prefix)] = scores[:, fold]
+            results['mean_%s_score' % prefix] = np.nanmean(scores, axis=1)
+            results['std_%s_score' % prefix] = np.nanstd(scores, axis=1)
+        results['mean_fit_time'] = np.nanmean(fit_times, axis=1)
+        results['std_fit_time'] = np.nanstd(fit_times, axis=1)
+        results['mean_score_time'] = np.nanmean(score_times, axis=1)
+        results['std_score_time'] = np.nanstd(score_times, axis=1)
+        results['n_folds'] = (~np.isnan(test_scores)).sum(axis=1)
+        # complete candidates first, then by mean score, like rankdata(method='min')
+        order = np.lexsort((-results['mean_test_score'], ~complete))
+        ranks = np.empty(len(candidates), dtype=np.int32)
+        previous, rank = None, 0
+        for position, index in enumerate(order):
+            key = (complete[index], results['mean_test_score'][index])
+            if key != previous:
+                rank, previous = position + 1, key
+            ranks[index] = rank
+        results['rank_test_score'] = ranks
+        return results
+
+
+def main():
+    import housing_de
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import GridSearchCV
+
+    parser = argparse.ArgumentParser(description="Warm-start forest search versus GridSearchCV on the rents data.")
+    parser.add_argument('--halving', action='store_true', help="successive halving over the folds")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument('--random-state', type=int, default=42,
+                        help="random_state of the forests, fixed so that both searches grow the same trees")
+    args = parser.parse_args()
+
+    (num_pipeline, data_prepared, data_prepared_transformed, data_labels,
+     test_data_prepared_trasformed, test_data_labels) = housing_de.transformed_sets()
+    forest_reg = RandomForestRegressor(random_state=args.random_state)
+    searches = {
+        'GridSearchCV': GridSearchCV(forest_reg, housing_de.param_grid, cv=5, scoring='neg_mean_squared_error',
+                                     return_train_score=True, n_jobs=args.jobs),
+        'warm start': WarmStartForestSearch(forest_reg, housing_de.param_grid, cv=5,
+                                            scoring='neg_mean_squared_error', return_train_score=True,
+                                            halving=args.halving, n_jobs=args.jobs),
+    }
+    print("%-14s %10s %10s %12s  %s" % ('', 'seconds', 'trees', 'best RMSE', 'best parameters'))
+    for name, search in searches.items():
+        started = time.perf_counter()
+        search.fit(data_prepared_transformed, data_labels)
+        seconds = time.perf_counter() - started
+        grown = getattr(search, 'n_trees_', None)
+        if grown is None:
+            grown = sum(params.get('n_estimators', 100) for params in search.cv_results_['params']) * search.n_splits_
+        print("%-14s %10.2f %10d %12.2f  %s" % (name, seconds, grown, np.sqrt(-search.best_score_),
+                                                search.best_params_))
+    expected, result = searches['GridSearchCV'].cv_results_, searches['warm start'].cv_results_
+    complete = result['n_folds'] == searches['warm start'].n_splits_
+    same = np.allclose(expected['mean_test_score'][complete], result['mean_test_score'][complete])
+    print("mean test scores of the %d complete candidates %s GridSearchCV's"
+          % (complete.sum(), 'equal' if same else 'differ from'))
+
+
+if __name__ == '__main__':
+    main()
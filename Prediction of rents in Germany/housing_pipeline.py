@@ -0,0 +1,232 @@
+"""Staged, cached data preparation of housing_de.py.
+
+drop -> geo -> median -> split, plus read for the complete file. The drop
+stage streams only the columns it keeps out of immo_data.csv. Every stage
+keeps its result in memory and in a Parquet snapshot under CACHE_DIR,
+keyed by the hash of immo_data.csv, the config of the stage and the key
+of the stage before it. A second run or another plot loads the snapshot
+instead of parsing the CSV again; a changed CSV or config builds the
+affected stages again.
+"""
+import hashlib
+import json
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedShuffleSplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common import filter_spec
+
+SOURCE = os.environ.get('HOUSING_SOURCE', 'immo_data.csv')
+CACHE_DIR = os.environ.get('HOUSING_CACHE_DIR', 'housing_cache')
+# part of every key, bump it when a stage function changes
+VERSION = 1
+
+READ_DTYPES = {
+    "regio1": "category",
+    "firingTypes": "category",
+    "heatingType": "category",
+    "petsAllowed": "category",
+    "typeOfFlat": "category"
+}
+
+LESS_COLUMNS = ["telekomTvOffer", "serviceCharge", "telekomHybridUploadSpeed", "newlyConst", "picturecount", "pricetrend",
+                "geo_bln", "yearConstructedRange", "interiorQual", "street", "baseRentRange", "thermalChar", "regio2",
+                "description", "facilities", "energyEfficiencyClass", "electricityBasePrice", "electricityKwhPrice",
+                "telekomUploadSpeed", "noParkSpaces", "garden", "livingSpaceRange", "heatingCosts", "noRoomsRange",
+                "cellar", "lift", "condition", "heatingType", "firingTypes", "geo_krs", "streetPlain", "petsAllowed",
+                "typeOfFlat", "regio3", "houseNumber", "date", "scoutId", "geo_plz", "balcony", "hasKitchen", "totalRent"]
+
+# rows outside these ranges are dropped, and so are rows with a missing value in one of the columns,
+# see common/filter_spec.py
+FILTERS = [
+    ('baseRent', '<', 3000),
+    ('noRooms', '<', 8),
+    ('floor', '<=', 20),
+    ('numberOfFloors', '<=', 20),
+    ('livingSpace', '<=', 500),
+    ('yearConstructed', '<=', 2020),
+    ('yearConstructed', '>=', 1850),
+    ('lastRefurbish', '<=', 2020),
+]
+
+# dtypes of the filtered columns
+NARROW_DTYPES = {
+    'baseRent': 'float32',
+    'livingSpace': 'float32',
+    'noRooms': 'float32',
+    'floor': 'int16',
+    'numberOfFloors': 'int16',
+    'yearConstructed': 'int16',
+    'lastRefurbish': 'int16',
+}
+
+# rows parsed at a time by the drop stage
+CHUNK_ROWS = int(os.environ.get('HOUSING_CHUNK_ROWS', 50000))
+
+REGIO1_TO_NUMS = {'Berlin': 0, 'Hamburg': 1, 'Bayern': 2, 'Hessen': 3,
+                  'Baden_Württemberg': 4, 'Nordrhein_Westfalen': 5,
+                  'Rheinland_Pfalz': 6, 'Niedersachsen': 7, 'Sachsen': 8,
+                  'Mecklenburg_Vorpommern': 9, 'Sachsen_Anhalt': 10,
+                  'Saarland': 11, 'Bremen': 12, 'Schleswig_Holstein': 13,
+                  'Thüringen': 14, 'Brandenburg': 15}
+
+def read_stage(config):
+    return pd.read_csv(SOURCE, dtype=config['dtypes'])
+
+
+def drop_stage(config):
+    """The columns that survive, filtered while the CSV streams in and narrowed afterwards.
+
+    The free-text and other dropped columns are never parsed. The filters
+    run on float64 like the original ones, and every filtered column is
+    complete after them, so the whole-number columns fit small ints.
+    """
+    chunks = []
+    rows, rejected = 0, np.zeros(len(config['filters']), dtype=np.int64)
+    for chunk in pd.read_csv(SOURCE, usecols=lambda column: column not in config['columns'],
+                             dtype={"regio1": object}, chunksize=CHUNK_ROWS):
+        keep, chunk_rejected = filter_spec.compile_mask(chunk, config['filters'])
+        chunks.append(chunk[keep].astype(config['dtypes']))
+        rows += len(chunk)
+        rejected += chunk_rejected
+    data = pd.concat(chunks)
+    filter_spec.report('immo_data.csv', config['filters'], rows, len(data), rejected.tolist())
+    # one categorical for all chunks, with the categories read_csv would have found
+    data['regio1'] = data['regio1'].astype('category')
+    return data
+
+
+def geo_stage(data, config):
+    # what replace() did to the categorical before pandas 1.4, unknown Lands keep their name
+    return data.assign(regio1=data['regio1'].cat.rename_categories(config['regio1']))
+
+
+def median_stage(data, config):
+    data = data.assign(median_base_rent=data.groupby('regio1')['baseRent'].transform(np.median),
+                       rooms_per_livingspace=data['noRooms'] / data['livingSpace'] * 100)
+    return data.replace([np.inf, -np.inf], np.nan).dropna(subset=["rooms_per_livingspace"], how="all")
+
+
+def split_stage(data, config):
+    data = data.reset_index(drop=True)
+    split = StratifiedShuffleSplit(n_splits=1, test_size=config['test_size'], random_state=config['random_state'])
+    train_index, test_index = next(split.split(data, data["regio1"]))
+    return data.loc[train_index], data.loc[test_index]
+
+
+# name -> (function, stage before, config)
+STAGES = {
+    'read': (read_stage, None, {'dtypes': READ_DTYPES}),
+    'drop': (drop_stage, None, {'columns': LESS_COLUMNS, 'filters': FILTERS, 'dtypes': NARROW_DTYPES}),
+    'geo': (geo_stage, 'drop', {'regio1': REGIO1_TO_NUMS}),
+    'median': (median_stage, 'geo', {}),
+    'split': (split_stage, 'median', {'test_size': 0.2, 'random_state': 42}),
+}
+
+# (name, key) -> tuple of frames
+_memory = {}
+_hashes = {}
+
+
+def source_hash(path=None):
+    """sha256 of ``path`` (SOURCE), remembered in CACHE_DIR as long as size and mtime do not change."""
+    path = SOURCE if path is None else path
+    stat = os.stat(path)
+    signature = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+    if tuple(signature) in _hashes:
+        return _hashes[tuple(signature)]
+    sidecar = os.path.join(CACHE_DIR, 'source.json')
+    try:
+        with open(sidecar) as f:
+            known = json.load(f)
+    except (OSError, ValueError):
+        known = {}
+    if known.get('signature') == signature:
+        digest = known['sha256']
+    else:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(sidecar, 'w') as f:
+            json.dump({'signature': signature, 'sha256': digest}, f)
+    _hashes[tuple(signature)] = digest
+    return digest
+
+
+def stage_key(name):
+    function, before, config = STAGES[name]
+    parent = stage_key(before) if before else source_hash()
+    payload = json.dumps([VERSION, name, config, parent], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _snapshot_paths(name, key, count):
+    return [os.path.join(CACHE_DIR, '%s-%s.%d.parquet' % (name, key, index)) for index in range(count)]
+
+
+def _categories(frame):
+    return {column: [frame[column].cat.categories.tolist(), bool(frame[column].cat.ordered)]
+            for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+
+
+def _read_snapshot(name, key):
+    try:
+        with open(os.path.join(CACHE_DIR, '%s-%s.json' % (name, key))) as f:
+            categories = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        frames = tuple(pd.read_parquet(path) for path in _snapshot_paths(name, key, len(categories)))
+    except (OSError, ImportError):
+        return None
+    # Parquet gives back categoricals of strings only, the Lands are numbered by then
+    for frame, columns in zip(frames, categories):
+        for column, (values, ordered) in columns.items():
+            frame[column] = pd.Categorical(frame[column], categories=values, ordered=ordered)
+    return frames
+
+
+def _write_snapshot(name, key, frames):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # one snapshot per stage, the older ones belong to another source or config
+    for entry in os.listdir(CACHE_DIR):
+        if entry.startswith(name + '-'):
+            os.remove(os.path.join(CACHE_DIR, entry))
+    try:
+        for frame, path in zip(frames, _snapshot_paths(name, key, len(frames))):
+            frame.to_parquet(path + '.tmp')
+            os.replace(path + '.tmp', path)
+    except ImportError as e:
+        warnings.warn("no Parquet snapshot of the %s stage: %s" % (name, e))
+        return
+    # written last, a snapshot without it is incomplete
+    with open(os.path.join(CACHE_DIR, '%s-%s.json' % (name, key)), 'w') as f:
+        json.dump([_categories(frame) for frame in frames], f)
+
+
+def _load(name):
+    key = stage_key(name)
+    frames = _memory.get((name, key))
+    if frames is None:
+        frames = _read_snapshot(name, key)
+        if frames is None:
+            function, before, config = STAGES[name]
+            result = function(config) if before is None else function(*_load(before), config)
+            frames = result if isinstance(result, tuple) else (result,)
+            _write_snapshot(name, key, frames)
+        _memory[name, key] = frames
+    return frames
+
+
+def load(name):
+    """Result of the stage ``name``, a copy the caller may change."""
+    frames = tuple(frame.copy() for frame in _load(name))
+    return frames if len(frames) > 1 else frames[0]
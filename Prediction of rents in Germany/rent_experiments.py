@@ -0,0 +1,160 @@
+"""Parallel run of the model comparison of housing_de.py.
+
+    python rent_experiments.py --cores 4
+
+Every cross-validation fold of the linear regression, the decision tree,
+the random forest and every candidate of the grid search is a task on one
+process pool of ``--cores`` workers. The scaled training set is put in
+shared memory once; the workers map it instead of receiving a pickled copy
+with every task. The best grid candidate is refit on the whole training
+set and evaluated on the test set, as in housing_de.main().
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import KFold, ParameterGrid
+from sklearn.tree import DecisionTreeRegressor
+
+import housing_de
+import rent_model
+
+
+def experiments(cv=10, grid_cv=5):
+    """``(group, name, estimator, cv)`` of every model housing_de.main() evaluates.
+
+    Slow ones first, so the pool does not end with one long task.
+    """
+    yield 'random_forest', 'random_forest', RandomForestRegressor(n_estimators=100, random_state=42), cv
+    for params in ParameterGrid(housing_de.param_grid):
+        name = 'grid ' + ' '.join('%s=%s' % item for item in sorted(params.items()))
+        yield 'grid_search', name, RandomForestRegressor(**params), grid_cv
+    yield 'decision_tree', 'decision_tree', DecisionTreeRegressor(), cv
+    yield 'linear_regression', 'linear_regression', LinearRegression(), cv
+
+
+def share(array):
+    """Copy ``array`` into a new shared memory block, returns the block and how to map it."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+# name -> (shared memory block, array) of this worker, set by _attach
+_arrays = {}
+
+
+def _attach(specs):
+    for key, (name, shape, dtype) in specs.items():
+        # the workers share the resource tracker of the parent, which unlinks the block
+        block = shared_memory.SharedMemory(name=name)
+        _arrays[key] = (block, np.ndarray(shape, dtype, buffer=block.buf))
+
+
+def _run(name, estimator, fold, cv):
+    X, y = _arrays['X'][1], _arrays['y'][1]
+    started = time.time()
+    if fold is None:
+        # the training-set RMSE housing_de prints first
+        train = test = np.arange(len(X))
+    else:
+        # the folds of cross_val_score(cv=cv) for a regressor
+        train, test = next(split for index, split in enumerate(KFold(cv).split(X)) if index == fold)
+    model = clone(estimator).fit(X[train], y[train])
+    rmse = np.sqrt(mean_squared_error(y[test], model.predict(X[test])))
+    return name, fold, rmse, started, time.time()
+
+
+def run(X, y, cores, cv=10, grid_cv=5):
+    """Results table of all experiments, one line per model or grid candidate."""
+    blocks = []
+    try:
+        specs = {}
+        for key, array in (('X', X), ('y', y)):
+            block, specs[key] = share(array)
+            blocks.append(block)
+        rows = {}
+        with ProcessPoolExecutor(cores, initializer=_attach, initargs=(specs,)) as pool:
+            futures = []
+            for group, name, estimator, folds in experiments(cv, grid_cv):
+                rows[name] = {'group': group, 'model': name, 'folds': folds, 'scores': [], 'train_rmse': np.nan,
+                              'cpu_seconds': 0.0, 'started': np.inf, 'finished': 0.0, 'estimator': estimator}
+                tasks = list(range(folds)) + ([None] if group != 'grid_search' else [])
+                futures += [pool.submit(_run, name, estimator, fold, folds) for fold in tasks]
+            for future in as_completed(futures):
+                name, fold, rmse, started, finished = future.result()
+                row = rows[name]
+                if fold is None:
+                    row['train_rmse'] = rmse
+                else:
+                    row['scores'].append((fold, rmse))
+                row['cpu_seconds'] += finished - started
+                row['started'] = min(row['started'], started)
+                row['finished'] = max(row['finished'], finished)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    table = []
+    for row in rows.values():
+        scores = np.array([rmse for _, rmse in sorted(row['scores'])])
+        table.append({'group': row['group'], 'model': row['model'], 'folds': row['folds'],
+                      'mse_mean': (scores ** 2).mean(), 'rmse_mean': scores.mean(), 'rmse_std': scores.std(),
+                      'train_rmse': row['train_rmse'],
+                      'task_seconds': row['cpu_seconds'], 'wall_seconds': row['finished'] - row['started'],
+                      'estimator': row['estimator']})
+    return pd.DataFrame(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cores', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--cv', type=int, default=10, help="folds of the three models")
+    parser.add_argument('--grid-cv', type=int, default=5, help="folds of the grid search")
+    parser.add_argument('--save', metavar='DIR', help="store the final model for rent_model.RentPredictor")
+    args = parser.parse_args()
+
+    (num_pipeline, data_prepared, data_prepared_transformed, data_labels,
+     test_data_prepared_trasformed, test_data_labels) = housing_de.transformed_sets()
+    started = time.perf_counter()
+    table = run(data_prepared_transformed, data_labels.to_numpy(dtype=np.float64), args.cores, args.cv, args.grid_cv)
+    wall = time.perf_counter() - started
+
+    print(table.drop(columns=['estimator', 'mse_mean']).to_string(index=False, float_format='%.2f'))
+    print("\n%d tasks on %d cores: %.1f s wall, %.1f s of fitting"
+          % (table['folds'].sum() + (table['group'] != 'grid_search').sum(), args.cores, wall,
+             table['task_seconds'].sum()))
+
+    # as GridSearchCV(refit=True): the first candidate with the lowest mean MSE, refit on the whole training set
+    grid = table[table['group'] == 'grid_search']
+    best = grid.loc[grid['mse_mean'].idxmin()]
+    final_model = clone(best['estimator']).set_params(n_jobs=args.cores)
+    final_model.fit(data_prepared_transformed, data_labels)
+    final_predictions = final_model.predict(test_data_prepared_trasformed)
+    squared_errors = (final_predictions - test_data_labels) ** 2
+    final_confidence = np.sqrt(stats.t.interval(0.95, len(squared_errors) - 1, loc=squared_errors.mean(),
+                                                scale=stats.sem(squared_errors)))
+    print("\nbest grid candidate: %s" % best['model'])
+    print("test RMSE: %.2f, 95%% confidence interval: %.2f - %.2f"
+          % (np.sqrt(squared_errors.mean()), final_confidence[0], final_confidence[1]))
+    print("relative importance of each attribute:")
+    for importance, attribute in sorted(zip(final_model.feature_importances_, data_prepared), reverse=True):
+        print("  %-24s %.4f" % (attribute, importance))
+    if args.save:
+        rent_model.save_model(args.save, num_pipeline, final_model.set_params(n_jobs=None), data_prepared)
+        print("model saved to %s" % args.save)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Persistence and batch scoring of the rents model.
+
+``save_model`` writes everything housing_de's model needs at prediction
+time to one directory:
+
+    rent-forest.sav    the fitted forest (the refit best grid candidate)
+    rent-scaler.sav    the fitted num_pipeline
+    rent-lookups.json  regio1 numbers, median base rent per Land, feature order
+
+``RentPredictor`` scores a batch of listings in one pass. The
+``median_base_rent`` and ``rooms_per_livingspace`` features are rebuilt
+from the stored lookups with array operations, no groupby over the data.
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import housing_pipeline
+
+MODEL_DIR = os.environ.get('RENT_MODEL_DIR', 'rent_model')
+FOREST_FILE = 'rent-forest.sav'
+SCALER_FILE = 'rent-scaler.sav'
+LOOKUPS_FILE = 'rent-lookups.json'
+
+# what a listing has to provide, baseRent is what the model predicts
+INPUT_FIELDS = ['regio1', 'livingSpace', 'noRooms', 'floor', 'numberOfFloors', 'yearConstructed', 'lastRefurbish']
+
+
+class RentError(ValueError):
+    """The listings cannot be read at all (as opposed to single bad rows)."""
+
+
+def save_model(directory, num_pipeline, model, data_prepared):
+    """Store the scaler, the forest and the lookups built from the training features ``data_prepared``."""
+    os.makedirs(directory, exist_ok=True)
+    # median_base_rent is constant per Land, it was computed before the split
+    medians = data_prepared.groupby('regio1', observed=True)['median_base_rent'].first()
+    lookups = {
+        'features': list(data_prepared.columns),
+        'regio1': housing_pipeline.REGIO1_TO_NUMS,
+        'median_base_rent': {str(int(land)): float(median) for land, median in medians.items()},
+    }
+    for name, obj in ((FOREST_FILE, model), (SCALER_FILE, num_pipeline)):
+        with open(os.path.join(directory, name), 'wb') as f:
+            pickle.dump(obj, f)
+    with open(os.path.join(directory, LOOKUPS_FILE), 'w') as f:
+        json.dump(lookups, f, indent=1, ensure_ascii=False)
+
+
+def _scalars(column):
+    # lists or objects of a JSON listing become missing values, the errors of their rows
+    return column.map(lambda value: value if isinstance(value, (str, int, float)) else None)
+
+
+class RentPredictor:
+    """The stored rents model, scoring DataFrames or lists of listings."""
+
+    def __init__(self, directory=MODEL_DIR):
+        with open(os.path.join(directory, FOREST_FILE), 'rb') as f:
+            self.model = pickle.load(f)
+        with open(os.path.join(directory, SCALER_FILE), 'rb') as f:
+            self.scaler = pickle.load(f)
+        with open(os.path.join(directory, LOOKUPS_FILE)) as f:
+            lookups = json.load(f)
+        self.features = lookups['features']
+        self.regio1 = lookups['regio1']
+        # median base rent indexed by the Land number, NaN for a Land without training listings;
+        # float32 like the baseRent it was computed from
+        self.median_base_rent = np.full(max(self.regio1.values()) + 1, np.nan, dtype=np.float32)
+        for land, median in lookups['median_base_rent'].items():
+            self.median_base_rent[int(land)] = median
+
+    def features_of(self, frame):
+        """``(X, errors)``: the unscaled features of the valid rows of ``frame`` in input order,
+        in the dtypes of housing_pipeline.NARROW_DTYPES, and the message of every invalid row by position."""
+        missing = [name for name in INPUT_FIELDS if name not in frame.columns]
+        if missing:
+            raise RentError("missing columns: %s" % ', '.join(missing))
+        errors = {}
+
+        def fail(mask, message):
+            for position in np.flatnonzero(mask):
+                errors.setdefault(int(position), message)
+
+        # Lands by name, or already numbered as in the training data
+        regio1 = _scalars(frame['regio1'])
+        names = regio1.map(self.regio1)
+        numbers = pd.to_numeric(regio1, errors='coerce')
+        numbers = numbers.where(numbers.isin(list(self.regio1.values())))
+        land = names.fillna(numbers).to_numpy(dtype=np.float64)
+        fail(np.isnan(land), "'regio1' is not a known Land")
+        median = np.full(len(frame), np.nan, dtype=np.float32)
+        median[~np.isnan(land)] = self.median_base_rent[land[~np.isnan(land)].astype(np.intp)]
+        fail(~np.isnan(land) & np.isnan(median), "no training listings in this Land")
+
+        columns = {'regio1': land, 'median_base_rent': median}
+        for name in INPUT_FIELDS[1:]:
+            values = pd.to_numeric(_scalars(frame[name]), errors='coerce').to_numpy(dtype=np.float64)
+            fail(~np.isfinite(values), "'%s' is missing or not a number" % name)
+            # narrowed like the training features, so the forest compares its thresholds to the same values
+            dtype = np.dtype(housing_pipeline.NARROW_DTYPES[name])
+            with np.errstate(invalid='ignore'):
+                columns[name] = values.astype(dtype)
+            if dtype.kind == 'i':
+                fail(np.isfinite(values) & (columns[name] != values), "'%s' must be a whole number" % name)
+        fail(columns['livingSpace'] <= 0, "'livingSpace' must be positive")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['rooms_per_livingspace'] = columns['noRooms'] / columns['livingSpace'] * 100
+
+        valid = np.ones(len(frame), dtype=bool)
+        valid[list(errors)] = False
+        X = pd.DataFrame({name: columns[name][valid] for name in self.features})
+        return X, errors
+
+    def predict(self, listings):
+        """Predicted base rent of every listing, raises RentError if one of them is invalid."""
+        frame = listings if isinstance(listings, pd.DataFrame) else pd.DataFrame.from_records(listings)
+        X, errors = self.features_of(frame)
+        if errors:
+            position, message = min(errors.items())
+            raise RentError("listing %d: %s" % (position, message))
+        return self._predict(X)
+
+    def score_frame(self, frame, offset=0):
+        """One line per listing of ``frame`` with ``row``, ``baseRent`` or ``error``."""
+        X, errors = self.features_of(frame)
+        valid = np.ones(len(frame), dtype=bool)
+        valid[list(errors)] = False
+        result = pd.DataFrame({'row': np.arange(offset, offset + len(frame))})
+        result['baseRent'] = pd.Series(self._predict(X), index=np.flatnonzero(valid))
+        result['error'] = pd.Series(errors, dtype=object)
+        return result
+
+    def _predict(self, X):
+        if not len(X):
+            return np.empty(0)
+        return self.model.predict(self.scaler.transform(X))
+
+
+_predictor = None
+
+
+def get_predictor():
+    """The RentPredictor of MODEL_DIR, loaded on first use."""
+    global _predictor
+    if _predictor is None:
+        _predictor = RentPredictor()
+    return _predictor
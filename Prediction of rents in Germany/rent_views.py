@@ -0,0 +1,67 @@
+"""Rent prediction API for a Django project.
+
+Put this folder on the Python path and include the routes::
+
+    path('', include('rent_views'))
+
+POST /api/rents/predict/ takes a JSON array of listings or CSV rows with
+the fields of rent_model.INPUT_FIELDS (regio1 by name, e.g. "Berlin") and
+answers with the predicted base rent of every listing, scored in one call.
+Invalid listings carry an ``error`` instead.
+"""
+import io
+import json
+
+import pandas as pd
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from rent_model import INPUT_FIELDS, RentError, get_predictor
+
+BATCH_MAX_ROWS = getattr(settings, 'RENT_BATCH_MAX_ROWS', 100000)
+BATCH_MAX_BYTES = getattr(settings, 'RENT_BATCH_MAX_BYTES', 20 * 1024 * 1024)
+
+
+@csrf_exempt
+@require_POST
+def predict(request):
+    body = request.read(BATCH_MAX_BYTES + 1)
+    if len(body) > BATCH_MAX_BYTES:
+        return JsonResponse({'error': "request body is limited to %d bytes" % BATCH_MAX_BYTES}, status=413)
+    content_type = request.content_type
+    if content_type == 'application/json':
+        try:
+            records = json.loads(body)
+        except ValueError:
+            return JsonResponse({'error': "invalid JSON"}, status=400)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return JsonResponse({'error': "expected a JSON array of listings"}, status=400)
+        frame = pd.DataFrame.from_records(records, columns=INPUT_FIELDS)
+    elif content_type in ('text/csv', 'application/csv'):
+        try:
+            frame = pd.read_csv(io.BytesIO(body), usecols=lambda c: c in INPUT_FIELDS)
+        except (ValueError, UnicodeDecodeError) as e:
+            return JsonResponse({'error': "cannot read the CSV: %s" % e}, status=400)
+    else:
+        return JsonResponse({'error': "use application/json or text/csv"}, status=415)
+    if len(frame) > BATCH_MAX_ROWS:
+        return JsonResponse({'error': "batch is limited to %d listings" % BATCH_MAX_ROWS}, status=413)
+
+    try:
+        result = get_predictor().score_frame(frame)
+    except RentError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if content_type != 'application/json':
+        return HttpResponse(result.to_csv(index=False, float_format='%.2f'), content_type='text/csv')
+    listings = [{'row': row, 'error': error} if isinstance(error, str) else {'row': row, 'baseRent': round(rent, 2)}
+                for row, rent, error in zip(result['row'].tolist(), result['baseRent'].tolist(),
+                                            result['error'].tolist())]
+    return JsonResponse(listings, safe=False)
+
+
+urlpatterns = [
+    path('api/rents/predict/', predict, name='rent_predict'),
+]
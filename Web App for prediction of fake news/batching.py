@@ -0,0 +1,147 @@
+"""Asyncio micro-batching for the ASGI entry point.
+
+Concurrent requests put their row on a bounded queue and await a future.
+One worker task per event loop takes the first waiting row, gives the
+others up to ``window`` seconds (or until ``max_batch`` rows are waiting)
+to join, scores the whole batch once in a thread and resolves the futures.
+"""
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from fake_news_app.instrumentation import run_in_view
+from fake_news_app.scoring import score_rows_cached
+
+WINDOW_MS = getattr(settings, 'FAKE_NEWS_MICROBATCH_WINDOW_MS', 2)
+MAX_BATCH = getattr(settings, 'FAKE_NEWS_MICROBATCH_MAX_BATCH', 64)
+MAX_QUEUE = getattr(settings, 'FAKE_NEWS_MICROBATCH_MAX_QUEUE', 1024)
+TIMEOUT = getattr(settings, 'FAKE_NEWS_MICROBATCH_TIMEOUT', 5.0)
+
+
+class QueueFull(Exception):
+    """The batcher queue is at its maximum depth, the caller should back off."""
+
+
+class MicroBatcher:
+
+    def __init__(self, score=score_rows_cached, window=WINDOW_MS / 1000.0, max_batch=MAX_BATCH, max_queue=MAX_QUEUE,
+                 view='predict_async'):
+        self.score = score
+        # the view the stages of the batched scoring are observed under
+        self.view = view
+        self.window = window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._batch_ready = asyncio.Event()
+        self._worker = None
+        self.stats = {
+            'submitted': 0, 'rejected': 0, 'timed_out': 0, 'failed_batches': 0,
+            'batches': 0, 'items': 0, 'max_batch_size': 0,
+            'last_batch_size': 0, 'last_batch_seconds': 0.0, 'max_batch_seconds': 0.0,
+            'total_batch_seconds': 0.0, 'max_queue_wait_seconds': 0.0,
+        }
+
+    async def submit(self, row, timeout=TIMEOUT):
+        """Queue one ``[title, author, text]`` row and wait for ``(label, probabilities)``."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise QueueFull("%d requests are already waiting" % self.max_queue)
+        self.stats['submitted'] += 1
+        if self._queue.qsize() >= self.max_batch:
+            self._batch_ready.set()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            raise
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        if self._queue.qsize() + 1 < self.max_batch:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+        self._batch_ready.clear()
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        # callers that timed out while waiting are not scored
+        return [item for item in batch if not item[1].done()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            wait = started - min(item[2] for item in batch)
+            try:
+                # the executor thread has none of the requests' context, so the view is named here
+                labels, probabilities = await loop.run_in_executor(None, run_in_view, self.view, self.score,
+                                                                   [item[0] for item in batch])
+            except Exception as e:
+                self.stats['failed_batches'] += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), label, proba in zip(batch, labels, probabilities):
+                if not future.done():
+                    future.set_result((label, proba))
+            self._record(len(batch), time.perf_counter() - started, wait)
+
+    def _record(self, size, seconds, wait):
+        stats = self.stats
+        stats['batches'] += 1
+        stats['items'] += size
+        stats['last_batch_size'] = size
+        stats['max_batch_size'] = max(stats['max_batch_size'], size)
+        stats['last_batch_seconds'] = seconds
+        stats['max_batch_seconds'] = max(stats['max_batch_seconds'], seconds)
+        stats['total_batch_seconds'] += seconds
+        stats['max_queue_wait_seconds'] = max(stats['max_queue_wait_seconds'], wait)
+
+    def metrics(self):
+        metrics = dict(self.stats)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['max_queue'] = self.max_queue
+        metrics['window_seconds'] = self.window
+        metrics['max_batch'] = self.max_batch
+        if metrics['batches']:
+            metrics['mean_batch_size'] = metrics['items'] / metrics['batches']
+            metrics['mean_batch_seconds'] = metrics['total_batch_seconds'] / metrics['batches']
+        return metrics
+
+
+# one batcher per event loop, an asyncio.Queue must not cross loops
+_batchers = weakref.WeakKeyDictionary()
+
+
+def served_over_asgi(request):
+    """Whether ``request`` came through the ASGI handler, whose event loop lives as long as the server.
+
+    Under WSGI every async view runs on an event loop of its own, so a
+    batcher would never see two requests.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def get_batcher():
+    loop = asyncio.get_running_loop()
+    # the worker task keeps its loop alive, so the entries of closed loops are dropped here
+    for closed in [other for other in _batchers if other.is_closed()]:
+        del _batchers[closed]
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = MicroBatcher()
+    return batcher
@@ -0,0 +1,96 @@
+"""Token budget for very long article bodies.
+
+Only a head and a tail window of the text are vectorized, which bounds
+tokenization time and memory for pasted books and scraped pages. The
+request body is streamed and never held completely in memory: the reader
+keeps the first and the last bytes of it and the token budget is applied
+to what was kept.
+"""
+import re
+from collections import deque
+
+from django.conf import settings
+
+# tokens of the article text that are vectorized, split between head and tail
+TOKEN_BUDGET = getattr(settings, 'FAKE_NEWS_TEXT_TOKEN_BUDGET', 5000)
+HEAD_FRACTION = getattr(settings, 'FAKE_NEWS_TEXT_HEAD_FRACTION', 0.5)
+# generous upper bound of utf-8 bytes per token, including the separators
+BYTES_PER_TOKEN = 32
+CHUNK_SIZE = 64 * 1024
+
+# CountVectorizer's default token_pattern
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+# the word characters a byte offset may have cut off at the end of the head or the start of the tail
+_PARTIAL_HEAD = re.compile(r"(?u)\w+\Z")
+_PARTIAL_TAIL = re.compile(r"(?u)\A\w+")
+
+
+def _split(budget):
+    head = int(round(budget * HEAD_FRACTION))
+    return head, budget - head
+
+
+def apply_token_budget(text, budget=TOKEN_BUDGET):
+    """Return ``(text, info)`` with at most ``budget`` tokens of ``text``."""
+    head, tail = _split(budget)
+    starts = []
+    ends = []
+    for match in TOKEN_PATTERN.finditer(text):
+        starts.append(match.start())
+        ends.append(match.end())
+    count = len(starts)
+    info = {'budget': budget, 'tokens': count, 'tokens_estimated': False, 'tokens_kept': min(count, budget),
+            'truncated': count > budget, 'strategy': 'head+tail'}
+    if count <= budget:
+        return text, info
+    kept = text[:ends[head - 1]] if head else ''
+    if tail:
+        kept += ' ' + text[starts[count - tail]:]
+    return kept, info
+
+
+def read_budgeted(stream, budget=TOKEN_BUDGET, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """Read a text body from ``stream`` keeping only the head and tail windows.
+
+    Returns ``(text, info)``; ``info['bytes']`` is the full size of the body.
+    The middle of a body larger than both windows is never tokenized, so its
+    ``info['tokens']`` is extrapolated from the windows by bytes and
+    ``info['tokens_estimated']`` is set.
+    """
+    head_tokens, tail_tokens = _split(budget)
+    head_limit = head_tokens * BYTES_PER_TOKEN
+    tail_limit = tail_tokens * BYTES_PER_TOKEN
+    head = bytearray()
+    tail = deque()
+    tail_size = 0
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if len(head) < head_limit:
+            take = head_limit - len(head)
+            head += chunk[:take]
+            chunk = chunk[take:]
+        if chunk and tail_limit:
+            tail.append(chunk)
+            tail_size += len(chunk)
+            while tail and tail_size - len(tail[0]) >= tail_limit:
+                tail_size -= len(tail.popleft())
+    skipped = total - len(head) - tail_size
+    tail = b''.join(tail)
+    if skipped > 0:
+        # the windows were cut at byte offsets, drop partial characters and tokens
+        tail = tail[-tail_limit:]
+        text = (_PARTIAL_HEAD.sub('', head.decode(encoding, 'ignore')) + ' '
+                + _PARTIAL_TAIL.sub('', tail.decode(encoding, 'ignore')))
+    else:
+        text = (bytes(head) + tail).decode(encoding, 'replace')
+    text, info = apply_token_budget(text, budget)
+    if skipped > 0:
+        info['tokens'] = max(info['tokens'], int(round(info['tokens'] * total / (len(head) + len(tail)))))
+        info['tokens_estimated'] = True
+    info['bytes'] = total
+    info['truncated'] = info['truncated'] or skipped > 0
+    return text, info
@@ -0,0 +1,164 @@
+"""Content-addressed cache of fake news predictions.
+
+Entries are keyed by a hash of the artifact version and the normalized
+``(title, author, text)`` triple, so a retrained model never serves labels
+of the previous one. The in-memory tier is an LRU with a TTL, the optional
+sqlite tier survives worker restarts and is shared by all workers; its
+rows expire by age only, whatever model version they belong to.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+MAX_ENTRIES = getattr(settings, 'FAKE_NEWS_PREDICTION_CACHE_SIZE', 10000)
+TTL = getattr(settings, 'FAKE_NEWS_PREDICTION_CACHE_TTL', 24 * 3600)
+DB_PATH = getattr(settings, 'FAKE_NEWS_PREDICTION_CACHE_DB', None)
+# how often a worker deletes the expired rows of the sqlite tier
+SWEEP_SECONDS = 3600
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize(value):
+    # whitespace never ends up in a CountVectorizer token, so runs of it
+    # can be collapsed without changing the prediction
+    return _whitespace.sub(' ', value).strip()
+
+
+def cache_key(row, version):
+    digest = hashlib.sha256(version.encode())
+    for value in row:
+        digest.update(b'\x1f')
+        digest.update(normalize(value).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, db_path=DB_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._version = None
+        self._disabled = False
+        self._swept = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0,
+                      'invalidations': 0}
+
+    @contextlib.contextmanager
+    def disabled(self):
+        """Every row is scored inside the block and nothing is stored, for the warm-up requests."""
+        self._disabled = True
+        try:
+            yield
+        finally:
+            self._disabled = False
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        # a connection opened before a fork (gunicorn preload) is not used by the child
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=5)
+            conn.execute('CREATE TABLE IF NOT EXISTS prediction_cache ('
+                         'key TEXT PRIMARY KEY, version TEXT, label TEXT, probabilities TEXT, created REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS prediction_cache_created ON prediction_cache (created)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _check_version(self, version):
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            if self._version is not None:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, row, version):
+        """Return the cached ``(label, probabilities)`` of a row or ``None``."""
+        if self._disabled:
+            return None
+        self._check_version(version)
+        key = cache_key(row, version)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+                self.stats['expired'] += 1
+        if self.db_path:
+            found = self._db().execute(
+                'SELECT label, probabilities, created FROM prediction_cache WHERE key = ?', (key,)).fetchone()
+            if found is not None and now - found[2] <= self.ttl:
+                value = (found[0], json.loads(found[1]))
+                self._remember(key, value, found[2])
+                self.stats['disk_hits'] += 1
+                return value
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, row, version, value):
+        if self._disabled:
+            return
+        self._check_version(version)
+        key = cache_key(row, version)
+        created = time.time()
+        self._remember(key, value, created)
+        if self.db_path:
+            with self._db() as conn:
+                conn.execute('INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?)',
+                             (key, version, value[0], json.dumps(value[1]), created))
+                # rows of another model version are never read, their keys contain the version, and
+                # expire like the others: during a rolling reload a worker of that version still uses them
+                if created - self._swept > SWEEP_SECONDS:
+                    self._swept = created
+                    conn.execute('DELETE FROM prediction_cache WHERE created < ?', (created - self.ttl,))
+
+    def _remember(self, key, value, created):
+        with self._lock:
+            self._entries[key] = (created, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._db() as conn:
+                conn.execute('DELETE FROM prediction_cache')
+
+    def metrics(self):
+        metrics = dict(self.stats)
+        metrics['size'] = len(self._entries)
+        metrics['max_entries'] = self.max_entries
+        metrics['ttl_seconds'] = self.ttl
+        metrics['disk'] = bool(self.db_path)
+        metrics['version'] = self._version
+        return metrics
+
+
+# the prediction cache of this worker
+prediction_cache = PredictionCache()
@@ -0,0 +1,182 @@
+"""Fused scorer for CountVectorizer + TfidfTransformer + LogisticRegression.
+
+After tokenization the whole pipeline is linear, so it collapses into one
+table per input column mapping a token to ``(idf, idf * coefficient)``:
+
+    v_j   = tf_j * idf_j
+    score = sum(v_j * coef_j) / ||v|| + intercept
+
+A document is tokenized once per column and the dot product and the norm
+are accumulated directly, without the intermediate sparse matrices.
+Decisions closer to zero than ``margin`` are handed to the sklearn
+pipeline, so the labels are exactly the ones of the pickled model.
+"""
+import math
+import re
+from collections import Counter
+
+COLUMNS = ['title', 'author', 'text']
+LABELS = {0: "TRUE", 1: "FAKE"}
+
+# decisions this close to the boundary are re-scored with sklearn
+MARGIN = 1e-9
+
+
+def _check_vectorizer(cv):
+    unsupported = {
+        'analyzer': (cv.analyzer, 'word'),
+        'tokenizer': (cv.tokenizer, None),
+        'preprocessor': (cv.preprocessor, None),
+        'stop_words': (cv.stop_words, None),
+        'strip_accents': (cv.strip_accents, None),
+        'ngram_range': (tuple(cv.ngram_range), (1, 1)),
+        'input': (cv.input, 'content'),
+    }
+    for name, (value, expected) in unsupported.items():
+        if value != expected:
+            raise ValueError("CountVectorizer(%s=%r) cannot be compiled" % (name, value))
+    if re.compile(cv.token_pattern).groups > 1:
+        raise ValueError("token_pattern with more than one group cannot be compiled")
+
+
+class CompiledScorer:
+    """Scores ``[title, author, text]`` rows like the fitted sklearn pipeline."""
+
+    def __init__(self, tables, token_patterns, lowercase, binary, intercept, classes,
+                 sublinear_tf=False, norm='l2', margin=MARGIN):
+        # tables: one {token: (idf, idf * coef)} dict per column
+        self.tables = tables
+        self.token_patterns = token_patterns
+        self.lowercase = lowercase
+        self.binary = binary
+        self.intercept = intercept
+        self.classes = classes
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.margin = margin
+        self._compile()
+
+    def _compile(self):
+        self._patterns = [re.compile(p) for p in self.token_patterns]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_patterns']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def decision(self, row):
+        """Decision function value of one row."""
+        dot = 0.0
+        norm = 0.0
+        for column, doc in enumerate(row):
+            if self.lowercase[column]:
+                doc = doc.lower()
+            counts = Counter(self._patterns[column].findall(doc))
+            table = self.tables[column]
+            binary = self.binary[column]
+            for token, count in counts.items():
+                entry = table.get(token)
+                if entry is None:
+                    continue
+                idf, weight = entry
+                tf = 1.0 if binary else float(count)
+                if self.sublinear_tf:
+                    tf = math.log(tf) + 1.0
+                value = tf * idf
+                dot += tf * weight
+                norm += value * value if self.norm == 'l2' else abs(value)
+        if self.norm == 'l2':
+            norm = math.sqrt(norm)
+        if self.norm is not None and norm > 0.0:
+            dot /= norm
+        return dot + self.intercept
+
+    def score(self, rows, fallback=None):
+        """Return ``(labels, probabilities)`` like ``scoring.score_rows``.
+
+        ``fallback`` scores the rows whose decision is within ``margin`` of zero.
+        """
+        negative, positive = self.classes
+        labels = []
+        probabilities = []
+        unsure = []
+        for i, row in enumerate(rows):
+            decision = self.decision(row)
+            if fallback is not None and abs(decision) < self.margin:
+                unsure.append(i)
+            # same as sklearn's expit, without overflow for large negative values
+            if decision >= 0:
+                p = 1.0 / (1.0 + math.exp(-decision))
+            else:
+                e = math.exp(decision)
+                p = e / (1.0 + e)
+            labels.append(positive if decision > 0 else negative)
+            probabilities.append({negative: 1.0 - p, positive: p})
+        if unsure:
+            exact_labels, exact_probabilities = fallback([rows[i] for i in unsure])
+            for i, label, proba in zip(unsure, exact_labels, exact_probabilities):
+                labels[i] = label
+                probabilities[i] = proba
+        return labels, probabilities
+
+
+def _column_vectorizers(vectorizer):
+    # the ColumnTransformer output follows transformers_, the scorer follows COLUMNS
+    columns = []
+    vectorizers = []
+    for name, estimator, column in vectorizer.transformers_:
+        if name == 'remainder':
+            if len(column) and estimator != 'drop':
+                raise ValueError("remainder columns %r cannot be compiled" % (column,))
+            continue
+        _check_vectorizer(estimator)
+        columns.append(column)
+        vectorizers.append(estimator)
+    if columns != COLUMNS:
+        raise ValueError("expected one CountVectorizer per column in the order %r" % (COLUMNS,))
+    return vectorizers
+
+
+def export_scorer(vectorizer, transformer, model, margin=MARGIN):
+    """Build a ``CompiledScorer`` from the fitted vectorizer, transformer and model."""
+    if len(model.classes_) != 2 or model.coef_.shape[0] != 1:
+        raise ValueError("only a binary LogisticRegression can be compiled")
+    if not transformer.use_idf:
+        raise ValueError("TfidfTransformer(use_idf=False) cannot be compiled")
+    coef = model.coef_[0]
+    idf = transformer.idf_
+    vectorizers = _column_vectorizers(vectorizer)
+
+    tables = []
+    offset = 0
+    for cv in vectorizers:
+        table = {}
+        for token, index in cv.vocabulary_.items():
+            j = offset + index
+            table[token] = (float(idf[j]), float(idf[j] * coef[j]))
+        offset += len(cv.vocabulary_)
+        tables.append(table)
+    if offset != coef.shape[0]:
+        raise ValueError("vectorizer has %d features, the model %d" % (offset, coef.shape[0]))
+
+    classes = tuple(LABELS.get(int(c), str(c)) for c in model.classes_)
+    return CompiledScorer(tables,
+                          [cv.token_pattern for cv in vectorizers],
+                          [cv.lowercase for cv in vectorizers],
+                          [cv.binary for cv in vectorizers],
+                          float(model.intercept_[0]), classes,
+                          sublinear_tf=transformer.sublinear_tf, norm=transformer.norm, margin=margin)
+
+
+def verify(scorer, rows, reference, fallback=False):
+    """Compare the scorer with ``reference(rows)``, returns the mismatching row indexes.
+
+    Without ``fallback`` the raw compiled decisions are compared.
+    """
+    labels, _ = scorer.score(rows, fallback=reference if fallback else None)
+    expected, _ = reference(rows)
+    return [i for i, (a, b) in enumerate(zip(labels, expected)) if a != b]
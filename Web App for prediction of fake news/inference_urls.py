@@ -0,0 +1,15 @@
+"""URLconf of the inference routes, see fake_news_app.lean.
+
+Only the prediction API is routed here, so these requests resolve without
+the admin and the HTML pages.
+"""
+from django.urls import path
+
+from fake_news_app import views
+
+urlpatterns = [
+    path('api/predict/', views.predict_batch, name='predict_batch'),
+    path('api/score/', views.predict_async, name='predict_async'),
+    path('api/article/', views.predict_article, name='predict_article'),
+    path('api/score/stats/', views.batcher_info, name='batcher_info'),
+]
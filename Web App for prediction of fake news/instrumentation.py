@@ -0,0 +1,233 @@
+"""Per-stage latency histograms of the prediction views.
+
+``StageTimingMiddleware`` times every request, the ``stage()`` context
+manager times the steps inside it (artifact loading, vectorization,
+predict, template rendering, ...). Both feed Prometheus style histograms
+that ``metrics`` serves as text on ``/metrics/`` to local clients. Slow
+requests are sampled and their stage breakdown is logged.
+
+With ``PREDICTION_METRICS = False`` the middleware removes itself and
+``stage()`` returns a shared no-op context manager.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    markcoroutinefunction = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'PREDICTION_METRICS', True)
+SLOW_SECONDS = getattr(settings, 'PREDICTION_SLOW_REQUEST_SECONDS', 1.0)
+SLOW_SAMPLE_RATE = getattr(settings, 'PREDICTION_SLOW_REQUEST_SAMPLE_RATE', 0.1)
+ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# stages of the request being handled in this thread / task
+_current = contextvars.ContextVar('prediction_stages', default=None)
+_noop = contextlib.nullcontext()
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = 0
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+# (view, stage) -> Histogram
+_histograms = {}
+_histograms_lock = threading.Lock()
+# name -> callable returning {key: number}, exported as gauges
+_collectors = {}
+
+
+def observe(view, name, seconds):
+    key = (view, name)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+class _Stage:
+    __slots__ = ('name', 'stages', 'started')
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        if self.stages is not None:
+            self.stages.append((self.name, seconds))
+        observe(_view_name(self.stages), self.name, seconds)
+        return False
+
+
+class _Stages(list):
+    # stage timings of one request, plus the name of its view
+    view = '-'
+
+
+def _view_name(stages):
+    return stages.view if stages is not None else '-'
+
+
+def stage(name):
+    """Context manager timing one stage of the current request."""
+    if not ENABLED:
+        return _noop
+    return _Stage(name, _current.get())
+
+
+def run_in_view(view, func, *args):
+    """``func(*args)`` with its stages observed under ``view``.
+
+    For work outside the request's context, e.g. in an executor thread,
+    which does not inherit the context variables of the caller.
+    """
+    if not ENABLED:
+        return func(*args)
+    stages = _Stages()
+    stages.view = view
+    context = contextvars.copy_context()
+    context.run(_current.set, stages)
+    return context.run(func, *args)
+
+
+def reset():
+    """Forget all observations, e.g. those of the warm-up requests."""
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def add_collector(name, collect):
+    """Export the numbers returned by ``collect()`` as ``<name>_<key>`` gauges."""
+    _collectors[name] = collect
+
+
+class StageTimingMiddleware:
+    # async capable, so async views are not pushed into a thread under ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # same marking as django's MiddlewareMixin
+            if markcoroutinefunction is not None:
+                markcoroutinefunction(self)
+            else:
+                self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stages = _Stages()
+        token = _current.set(stages)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            _current.reset(token)
+        self._finish(request, stages, total)
+        return response
+
+    async def __acall__(self, request):
+        stages = _Stages()
+        token = _current.set(stages)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = time.perf_counter() - started
+            _current.reset(token)
+        self._finish(request, stages, total)
+        return response
+
+    def _finish(self, request, stages, total):
+        observe(stages.view, 'total', total)
+        if total >= SLOW_SECONDS and random.random() < SLOW_SAMPLE_RATE:
+            breakdown = ', '.join('%s=%.1fms' % (name, seconds * 1000) for name, seconds in stages)
+            logger.warning("Slow request %s %s took %.1fms: %s", request.method, request.path,
+                           total * 1000, breakdown or 'no stages')
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # the stages of the request are labelled with the url name of its view
+        stages = _current.get()
+        match = request.resolver_match
+        if stages is not None and match is not None and match.url_name:
+            stages.view = match.url_name
+        return None
+
+
+def _labels(**labels):
+    return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for key, value in labels.items())
+
+
+def render_metrics():
+    lines = [
+        '# HELP prediction_stage_seconds Time spent per stage of the prediction views.',
+        '# TYPE prediction_stage_seconds histogram',
+    ]
+    for (view, name), histogram in sorted(_histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append('prediction_stage_seconds_bucket{%s} %d' % (_labels(view=view, stage=name, le=bound),
+                                                                     cumulative))
+        lines.append('prediction_stage_seconds_sum{%s} %r' % (_labels(view=view, stage=name), histogram.sum))
+        lines.append('prediction_stage_seconds_count{%s} %d' % (_labels(view=view, stage=name), histogram.count))
+    for collector, collect in sorted(_collectors.items()):
+        for key, value in sorted(collect().items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = '%s_%s' % (collector, key)
+            lines.append('# TYPE %s gauge' % metric)
+            lines.append('%s %r' % (metric, value))
+    return '\n'.join(lines) + '\n'
+
+
+# our metrics page, only for local scrapers
+def metrics(request):
+    if not ENABLED or request.META.get('REMOTE_ADDR') not in ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,78 @@
+"""Lean request path of the prediction API.
+
+Requests under ``INFERENCE_PATH_PREFIXES`` are resolved against the small
+``INFERENCE_URLCONF`` and bypass the session, CSRF, authentication and
+messages middleware, so an anonymous prediction never touches the session
+machinery or the database. The HTML pages and the admin keep the full
+stack. The classes below subclass the stock middleware, which keeps the
+admin system checks satisfied.
+"""
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import csrf
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    markcoroutinefunction = None
+
+INFERENCE_PATH_PREFIXES = tuple(getattr(settings, 'INFERENCE_PATH_PREFIXES', ('/api/',)))
+INFERENCE_URLCONF = getattr(settings, 'INFERENCE_URLCONF', 'fake_news_app.inference_urls')
+
+
+def is_inference(request):
+    return request.path_info.startswith(INFERENCE_PATH_PREFIXES)
+
+
+class InferenceURLConfMiddleware:
+    """Resolves the inference routes against ``INFERENCE_URLCONF``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # same marking as django's MiddlewareMixin, the coroutine of get_response is passed through
+            if markcoroutinefunction is not None:
+                markcoroutinefunction(self)
+            else:
+                self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if is_inference(request):
+            request.urlconf = INFERENCE_URLCONF
+        return self.get_response(request)
+
+
+class SkipOnInference:
+    """Mixin for a stock middleware class that is bypassed on the inference routes."""
+
+    def __call__(self, request):
+        if is_inference(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SkipOnInference, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SkipOnInference, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_inference(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(SkipOnInference, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SkipOnInference, messages.MessageMiddleware):
+    pass
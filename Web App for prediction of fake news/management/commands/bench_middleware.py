@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# the lean middleware and the stock classes they bypass
+STOCK = {
+    'fake_news_app.lean.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'fake_news_app.lean.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'fake_news_app.lean.AuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'fake_news_app.lean.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+ARTICLE = ("The senator said on Tuesday that the committee would publish its report next week, "
+           "after months of hearings with officials from several agencies. ") * 20
+
+
+def stock_middleware():
+    return [STOCK.get(path, path) for path in settings.MIDDLEWARE
+            if path != 'fake_news_app.lean.InferenceURLConfMiddleware']
+
+
+class Command(BaseCommand):
+    help = "Per-request overhead of the full middleware stack versus the lean inference path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/article/?title=Benchmark&author=Staff',
+                            help="inference route to request")
+        parser.add_argument('--requests', type=int, default=2000, help="requests per round")
+        parser.add_argument('--rounds', type=int, default=5, help="rounds per stack, the median is reported")
+
+    def handle(self, *args, **options):
+        profiles = [('stock', stock_middleware()), ('lean', list(settings.MIDDLEWARE))]
+        results = {}
+        for name, middleware in profiles:
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                response = self._request(client, options['path'])
+                if response.status_code != 200:
+                    raise CommandError("%s %s answered %d" % (name, options['path'], response.status_code))
+                with CaptureQueriesContext(connection) as queries:
+                    self._request(client, options['path'])
+                rounds = []
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        self._request(client, options['path'])
+                    rounds.append((time.perf_counter() - started) / options['requests'] * 1e6)
+            results[name] = (statistics.median(rounds), len(queries), len(middleware))
+
+        self.stdout.write("%-6s %12s %12s %12s" % ('', 'middleware', 'us/request', 'db queries'))
+        for name, (us, queries, count) in results.items():
+            self.stdout.write("%-6s %12d %12.1f %12d" % (name, count, us, queries))
+        self.stdout.write("removed: %.1f us per request" % (results['stock'][0] - results['lean'][0]))
+
+    def _request(self, client, path):
+        # the prediction cache answers the repeated article, so the stack dominates
+        response = client.post(path, ARTICLE, content_type='text/plain')
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return response
@@ -0,0 +1,85 @@
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from fake_news_app.compiled import export_scorer, verify
+from fake_news_app.registry import ModelRegistry
+from fake_news_app.scoring import COLUMNS, score_rows_sklearn
+
+# tokens per synthetic title, author and text
+SYNTHETIC_LENGTHS = (10, 2, 600)
+
+
+def synthetic_rows(scorer, n, seed=42):
+    rng = random.Random(seed)
+    vocabularies = [list(table) for table in scorer.tables]
+    rows = []
+    for _ in range(n):
+        row = []
+        for vocabulary, length in zip(vocabularies, SYNTHETIC_LENGTHS):
+            words = [rng.choice(vocabulary) for _ in range(length)]
+            # unknown words cost a lookup as well
+            words += ['zz%dq' % rng.randrange(10 ** 6) for _ in range(length // 10)]
+            row.append(' '.join(words))
+        rows.append(row)
+    return rows
+
+
+def measure(score, rows, batch):
+    tracemalloc.start()
+    started = time.perf_counter()
+    labels = []
+    for i in range(0, len(rows), batch):
+        labels.extend(score(rows[i:i + batch])[0])
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return labels, seconds, peak
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled linear scorer with the sklearn pipeline (labels, latency, memory)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="number of articles to score")
+        parser.add_argument('--csv', help="CSV with title, author and text columns instead of synthetic articles")
+        parser.add_argument('--batch', type=int, default=1, help="rows per scoring call, 1 is the /result/ case")
+
+    def handle(self, *args, **options):
+        artifacts = ModelRegistry(compiled=False).load()
+        started = time.perf_counter()
+        scorer = export_scorer(artifacts.vectorizer, artifacts.transformer, artifacts.model)
+        self.stdout.write("export: %.2fs, %d tokens" % (time.perf_counter() - started,
+                                                       sum(len(t) for t in scorer.tables)))
+
+        if options['csv']:
+            df = pd.read_csv(options['csv'], usecols=COLUMNS, nrows=options['rows']).fillna(' ')
+            rows = df[COLUMNS].astype(str).values.tolist()
+        else:
+            rows = synthetic_rows(scorer, options['rows'])
+        if not rows:
+            raise CommandError("no rows to score")
+
+        def reference(batch):
+            return score_rows_sklearn(batch, artifacts)
+
+        mismatches = verify(scorer, rows, reference)
+        exact = verify(scorer, rows, reference, fallback=True)
+        self.stdout.write("label mismatches: %d raw, %d with fallback (of %d rows)"
+                          % (len(mismatches), len(exact), len(rows)))
+
+        batch = options['batch']
+        results = {
+            'sklearn': measure(reference, rows, batch),
+            'compiled': measure(lambda b: scorer.score(b, fallback=reference), rows, batch),
+        }
+        self.stdout.write("%-10s %14s %14s" % ('', 'us/row', 'peak KiB'))
+        for name, (_, seconds, peak) in results.items():
+            self.stdout.write("%-10s %14.1f %14.1f" % (name, seconds / len(rows) * 1e6, peak / 1024))
+        speedup = results['sklearn'][1] / results['compiled'][1]
+        self.stdout.write("speedup: %.1fx" % speedup)
+        if exact:
+            raise CommandError("compiled scorer disagrees with sklearn on rows %r" % exact[:10])
@@ -0,0 +1,48 @@
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from fake_news_app.budget import TOKEN_BUDGET, apply_token_budget
+from fake_news_app.registry import registry
+from fake_news_app.scoring import COLUMNS, score_rows
+
+
+class Command(BaseCommand):
+    help = "Measure how often the text token budget changes the label on a labelled CSV (e.g. fake_news_train.csv)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', help="CSV with title, author, text and optionally label columns")
+        parser.add_argument('--budget', type=int, action='append',
+                            help="token budget to check, can be repeated (default %d)" % TOKEN_BUDGET)
+        parser.add_argument('--rows', type=int, default=None, help="only read the first ROWS articles")
+
+    def handle(self, *args, **options):
+        df = pd.read_csv(options['csv'], nrows=options['rows']).fillna(' ')
+        rows = df[COLUMNS].astype(str).values.tolist()
+        artifacts = registry.get()
+
+        started = time.perf_counter()
+        full, _ = score_rows(rows, artifacts)
+        full_seconds = time.perf_counter() - started
+        self.stdout.write("%-8s %10s %12s %10s %10s" % ('budget', 'truncated', 'label diff', 'accuracy', 'seconds'))
+        self._report('none', 0, full, full, df, full_seconds)
+
+        for budget in options['budget'] or [TOKEN_BUDGET]:
+            started = time.perf_counter()
+            budgeted = []
+            truncated = 0
+            for title, author, text in rows:
+                text, info = apply_token_budget(text, budget)
+                truncated += info['truncated']
+                budgeted.append([title, author, text])
+            labels, _ = score_rows(budgeted, artifacts)
+            self._report(budget, truncated, labels, full, df, time.perf_counter() - started)
+
+    def _report(self, budget, truncated, labels, full, df, seconds):
+        changed = sum(a != b for a, b in zip(labels, full))
+        accuracy = '-'
+        if 'label' in df:
+            expected = df['label'].map({0: "TRUE", 1: "FAKE"})
+            accuracy = '%.4f' % (expected == pd.Series(labels, index=df.index)).mean()
+        self.stdout.write("%-8s %10d %12d %10s %10.2f" % (budget, truncated, changed, accuracy, seconds))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fake_news_app.compiled import export_scorer
+from fake_news_app.mapped import dir_size, load_scorer, save_scorer
+from fake_news_app.registry import COMPILED_DIR, ModelRegistry
+
+
+class Command(BaseCommand):
+    help = "Export the fake news pipeline to the memory-mapped scorer format shared by all workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=COMPILED_DIR, help="target directory")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        artifacts = ModelRegistry(compiled=False).load()
+        scorer = export_scorer(artifacts.vectorizer, artifacts.transformer, artifacts.model)
+        save_scorer(scorer, options['output'], artifacts.version)
+
+        # every token of the mapped tables must give back the exported weights
+        mapped = load_scorer(options['output'])
+        for column, (table, mapped_table) in enumerate(zip(scorer.tables, mapped.tables)):
+            if len(mapped_table) != len(table):
+                raise CommandError("column %d: %d tokens mapped, %d exported" % (column, len(mapped_table), len(table)))
+            for token, entry in table.items():
+                if mapped_table.get(token) != entry:
+                    raise CommandError("column %d: token %r does not round-trip" % (column, token))
+
+        self.stdout.write("exported version %s to %s (%.1f MiB) in %.1fs" % (
+            artifacts.version, options['output'], dir_size(options['output']) / 2 ** 20,
+            time.perf_counter() - started))
@@ -0,0 +1,200 @@
+"""Offline bulk scoring of fake news CSV archives.
+
+The input (title, author and text columns, like fake_news_train.csv) is
+streamed in chunks. Every chunk is scored in a process pool whose workers
+load the artifacts once, and results are written in input order as soon
+as they are ready, so memory stays bounded by the chunks in flight.
+
+A ``<output>.progress.json`` sidecar records how many chunks were written.
+After an interruption ``--resume`` truncates the output to the last
+recorded chunk and continues with the next one.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from fake_news_app.registry import ModelRegistry
+from fake_news_app.scoring import COLUMNS, score_rows
+
+# artifacts of this worker process, loaded by _init_worker
+_artifacts = None
+
+
+def _init_worker():
+    global _artifacts
+    # no hot reload, an archive is scored with one model version
+    _artifacts = ModelRegistry(check_interval=-1).load()
+
+
+def _score_chunk(index, rows):
+    labels, probabilities = score_rows(rows, _artifacts)
+    return index, labels, probabilities
+
+
+def _progress_path(output):
+    return output.rstrip(os.sep) + '.progress.json'
+
+
+def _write_progress(output, progress):
+    path = _progress_path(output)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(progress, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class CsvWriter:
+    """Appends chunks to one CSV file, ``position`` is its committed size."""
+
+    def __init__(self, path, position):
+        self.path = path
+        mode = 'r+b' if position and os.path.exists(path) else 'wb'
+        self.file = open(path, mode)
+        # drop whatever was written after the last recorded chunk
+        self.file.truncate(position)
+        self.file.seek(position)
+
+    def write(self, index, df):
+        self.file.write(df.to_csv(header=self.file.tell() == 0, index=False).encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes every chunk as one part file of a Parquet dataset directory."""
+
+    def __init__(self, path, chunks):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise CommandError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            # parts after the last recorded chunk are incomplete
+            if name.startswith('part-') and (not name.endswith('.parquet') or int(name[5:10]) >= chunks):
+                os.remove(os.path.join(path, name))
+
+    def write(self, index, df):
+        part = os.path.join(self.path, 'part-%05d.parquet' % index)
+        df.to_parquet(part + '.tmp', index=False)
+        os.replace(part + '.tmp', part)
+        return None
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Score a CSV of articles (title, author, text) in chunks across a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="CSV with title, author and text columns")
+        parser.add_argument('output', help="CSV file, or Parquet dataset directory with --format parquet")
+        parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                            help="output format, by default guessed from the output name")
+        parser.add_argument('--chunksize', type=int, default=5000, help="rows per chunk")
+        parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                            help="worker processes, 1 scores in this process")
+        parser.add_argument('--keep', action='append', default=[],
+                            help="input column copied to the output, e.g. an id, can be repeated")
+        parser.add_argument('--resume', action='store_true', help="continue an interrupted run")
+        parser.add_argument('--overwrite', action='store_true', help="start over if the output exists")
+
+    def handle(self, *args, **options):
+        source, output = options['input'], options['output']
+        output_format = options['format'] or ('parquet' if output.rstrip(os.sep).endswith('.parquet') else 'csv')
+        chunksize = options['chunksize']
+        stat = os.stat(source)
+        job = {'input': os.path.abspath(source), 'input_size': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns,
+               'chunksize': chunksize, 'format': output_format, 'keep': options['keep']}
+
+        progress = self._progress(output, job, options['resume'], options['overwrite'])
+        if output_format == 'parquet':
+            writer = ParquetWriter(output, progress['chunks'])
+        else:
+            writer = CsvWriter(output, progress['output_bytes'])
+        _write_progress(output, progress)
+
+        reader = pd.read_csv(source, usecols=COLUMNS + options['keep'], dtype=str, chunksize=chunksize)
+        skip = progress['chunks']
+        started = time.perf_counter()
+        scored = 0
+        try:
+            for index, chunk, labels, probabilities in self._scored(reader, skip, options['jobs']):
+                df = pd.DataFrame({'row': chunk.index})
+                for column in options['keep']:
+                    df[column] = chunk[column].values
+                df['label'] = labels
+                for label in sorted(probabilities[0]):
+                    df['proba_' + label] = [p[label] for p in probabilities]
+                position = writer.write(index, df)
+                progress['chunks'] = index + 1
+                progress['rows'] += len(df)
+                if position is not None:
+                    progress['output_bytes'] = position
+                _write_progress(output, progress)
+                scored += len(df)
+                seconds = time.perf_counter() - started
+                self.stdout.write("chunk %d: %d rows scored, %.0f rows/s" % (index, progress['rows'],
+                                                                             scored / seconds))
+        finally:
+            writer.close()
+
+        progress['complete'] = True
+        _write_progress(output, progress)
+        seconds = time.perf_counter() - started
+        self.stdout.write("scored %d rows (%d in this run) in %.1fs, %.0f rows/s -> %s" % (
+            progress['rows'], scored, seconds, scored / seconds if seconds else 0, output))
+
+    def _progress(self, output, job, resume, overwrite):
+        fresh = dict(job, chunks=0, rows=0, output_bytes=0, complete=False)
+        path = _progress_path(output)
+        if overwrite or not (os.path.exists(output) or os.path.exists(path)):
+            return fresh
+        if not resume:
+            raise CommandError("%s exists, use --resume to continue or --overwrite to start over" % output)
+        try:
+            with open(path) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            raise CommandError("%s has no readable %s, use --overwrite" % (output, path))
+        if any(progress.get(key) != value for key, value in job.items()):
+            raise CommandError("%s was written for a different input or options, use --overwrite" % output)
+        if progress.get('complete'):
+            raise CommandError("%s is already complete" % output)
+        self.stdout.write("resuming after chunk %d (%d rows)" % (progress['chunks'] - 1, progress['rows']))
+        return progress
+
+    def _scored(self, reader, skip, jobs):
+        """Yield ``(index, chunk, labels, probabilities)`` in input order."""
+        chunks = ((index, chunk.fillna(' ')) for index, chunk in enumerate(reader) if index >= skip)
+        if jobs <= 1:
+            _init_worker()
+            for index, chunk in chunks:
+                yield (index, chunk) + _score_chunk(index, chunk[COLUMNS].values.tolist())[1:]
+            return
+
+        with ProcessPoolExecutor(jobs, initializer=_init_worker) as pool:
+            # at most two chunks per worker are parsed or scored at any time
+            pending = {}
+            for index, chunk in chunks:
+                pending[index] = (chunk, pool.submit(_score_chunk, index, chunk[COLUMNS].values.tolist()))
+                while len(pending) >= 2 * jobs:
+                    yield self._next(pending)
+            while pending:
+                yield self._next(pending)
+
+    @staticmethod
+    def _next(pending):
+        index = min(pending)
+        chunk, future = pending.pop(index)
+        _, labels, probabilities = future.result()
+        return index, chunk, labels, probabilities
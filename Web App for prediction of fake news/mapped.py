@@ -0,0 +1,138 @@
+"""Memory-mapped on-disk format of the compiled scorer.
+
+Every column of the scorer is stored as flat files that all workers map
+read-only, so the page cache holds one physical copy for the whole
+container and a worker starts without unpickling the vocabulary:
+
+    <column>.strings   sorted tokens, utf-8, concatenated
+    <column>.offsets   int64 start offset of every token (+ one end offset)
+    <column>.slots     int32 open-addressing hash index into the tokens
+    <column>.idf       float64 idf of every token
+    <column>.weight    float64 idf * coefficient of every token
+
+``meta.json`` holds the scalar parameters and the version of the pickled
+artifacts the directory was exported from.
+"""
+import json
+import mmap
+import os
+import zlib
+
+import numpy as np
+
+from fake_news_app.compiled import COLUMNS, CompiledScorer
+
+FORMAT_VERSION = 1
+
+
+def _encode(token):
+    return token.encode('utf-8', 'surrogatepass')
+
+
+class MappedTable:
+    """Read-only ``{token: (idf, weight)}`` mapping backed by memory-mapped files."""
+
+    def __init__(self, directory, column):
+        prefix = os.path.join(directory, column)
+        with open(prefix + '.strings', 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._strings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # memoryviews of the mapped arrays, indexing them is much cheaper than numpy scalars
+        self._offsets = memoryview(np.load(prefix + '.offsets.npy', mmap_mode='r'))
+        self._slots = memoryview(np.load(prefix + '.slots.npy', mmap_mode='r'))
+        self._idf = memoryview(np.load(prefix + '.idf.npy', mmap_mode='r'))
+        self._weight = memoryview(np.load(prefix + '.weight.npy', mmap_mode='r'))
+        self._mask = len(self._slots) - 1
+
+    def _token(self, index):
+        return self._strings[self._offsets[index]:self._offsets[index + 1]]
+
+    def get(self, token, default=None):
+        key = _encode(token)
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            index = self._slots[slot]
+            if index < 0:
+                return default
+            if self._token(index) == key:
+                return self._idf[index], self._weight[index]
+            slot = (slot + 1) & self._mask
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._token(index).decode('utf-8', 'surrogatepass')
+
+
+def _hash_slots(keys):
+    # power of two with a load factor of at most 0.5
+    size = 1
+    while size < 2 * max(len(keys), 1):
+        size *= 2
+    slots = np.full(size, -1, dtype=np.int32)
+    mask = size - 1
+    for index, key in enumerate(keys):
+        slot = zlib.crc32(key) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = index
+    return slots
+
+
+def save_scorer(scorer, directory, source_version):
+    """Write a ``CompiledScorer`` to ``directory`` in the memory-mapped format."""
+    os.makedirs(directory, exist_ok=True)
+    for column, table in zip(COLUMNS, scorer.tables):
+        tokens = sorted(table, key=_encode)
+        keys = [_encode(token) for token in tokens]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(key) for key in keys], out=offsets[1:])
+        prefix = os.path.join(directory, column)
+        with open(prefix + '.strings', 'wb') as f:
+            f.write(b''.join(keys))
+        np.save(prefix + '.offsets.npy', offsets)
+        np.save(prefix + '.slots.npy', _hash_slots(keys))
+        np.save(prefix + '.idf.npy', np.array([table[t][0] for t in tokens], dtype=np.float64))
+        np.save(prefix + '.weight.npy', np.array([table[t][1] for t in tokens], dtype=np.float64))
+    meta = {
+        'format': FORMAT_VERSION,
+        'source_version': source_version,
+        'columns': COLUMNS,
+        'token_patterns': scorer.token_patterns,
+        'lowercase': scorer.lowercase,
+        'binary': scorer.binary,
+        'intercept': scorer.intercept,
+        'classes': list(scorer.classes),
+        'sublinear_tf': scorer.sublinear_tf,
+        'norm': scorer.norm,
+        'margin': scorer.margin,
+    }
+    # meta.json is written last, a directory without it is never loaded
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def dir_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('format') == FORMAT_VERSION else None
+
+
+def load_scorer(directory, meta=None):
+    """Map a directory written by ``save_scorer`` and return its ``CompiledScorer``."""
+    meta = meta or read_meta(directory)
+    if meta is None:
+        raise ValueError("%s is not a compiled scorer directory" % directory)
+    tables = [MappedTable(directory, column) for column in meta['columns']]
+    return CompiledScorer(tables, meta['token_patterns'], meta['lowercase'], meta['binary'],
+                          meta['intercept'], tuple(meta['classes']),
+                          sublinear_tf=meta['sublinear_tf'], norm=meta['norm'], margin=meta['margin'])
@@ -0,0 +1,208 @@
+"""Process-wide registry for the fake news model artifacts.
+
+Every worker unpickles the model, vectorizer and transformer once and then
+hands out the same read-only snapshot to all requests. When one of the
+``.sav`` files changes on disk (mtime/size and then checksum) a new snapshot
+is loaded next to the old one and swapped in atomically, so requests that
+already hold the old snapshot finish with it undisturbed.
+
+If ``manage.py export_mmap`` wrote a memory-mapped scorer for the current
+``.sav`` files, the worker maps it instead of unpickling, and the pickles
+are only loaded if the sklearn pipeline is actually needed.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+from fake_news_app.compiled import export_scorer
+from fake_news_app.mapped import dir_size, load_scorer, read_meta
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILES = {
+    'model': 'fake_news_model.sav',
+    'vectorizer': 'fake_news_vectorizer.sav',
+    'transformer': 'fake_news_transformer.sav',
+}
+
+# seconds between two stat() checks of the artifact files
+CHECK_INTERVAL = float(os.environ.get('FAKE_NEWS_MODEL_CHECK_INTERVAL', 5))
+
+# score with the fused linear scorer instead of the three sklearn objects
+COMPILED_SCORER = os.environ.get('FAKE_NEWS_COMPILED_SCORER', '1') == '1'
+
+# directory written by manage.py export_mmap
+COMPILED_DIR = os.environ.get('FAKE_NEWS_COMPILED_DIR', 'fake_news_compiled')
+
+# immutable bundle shared by all requests of one worker
+Artifacts = namedtuple('Artifacts', ['model', 'vectorizer', 'transformer', 'version', 'scorer'])
+
+
+class LazyArtifact:
+    """Stands in for a pickled object and unpickles it on first use."""
+
+    def __init__(self, path, on_load=None):
+        self._path = path
+        self._on_load = on_load
+        self._object = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._object is None:
+            with self._lock:
+                if self._object is None:
+                    t0 = time.perf_counter()
+                    with open(self._path, 'rb') as f:
+                        obj = pickle.load(f)
+                    if self._on_load is not None:
+                        self._on_load(time.perf_counter() - t0)
+                    self._object = obj
+        return self._object
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Loads the artifacts once and reloads them when a file changes."""
+
+    def __init__(self, files=None, base_dir='', check_interval=CHECK_INTERVAL, compiled=COMPILED_SCORER,
+                 compiled_dir=COMPILED_DIR):
+        self.files = dict(files or ARTIFACT_FILES)
+        self.base_dir = base_dir
+        self.check_interval = check_interval
+        self.compiled = compiled
+        self.compiled_dir = os.path.join(base_dir, compiled_dir) if compiled_dir else None
+        self._snapshot = None
+        self._stats = {}
+        self._checksums = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._metrics = {'loads': 0, 'reloads': 0, 'reload_errors': 0, 'last_load_seconds': 0.0, 'artifacts': {}}
+
+    def path(self, name):
+        return os.path.join(self.base_dir, self.files[name])
+
+    def _stat(self):
+        stats = {}
+        for name in self.files:
+            st = os.stat(self.path(name))
+            stats[name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def _load(self, stats, checksums):
+        started = time.perf_counter()
+        version = hashlib.sha256(''.join(checksums[name] for name in sorted(checksums)).encode()).hexdigest()[:16]
+        artifacts = {
+            name: {'file': self.files[name], 'size_bytes': stats[name][1], 'load_seconds': None,
+                   'checksum': checksums[name]}
+            for name in self.files
+        }
+        meta = read_meta(self.compiled_dir) if self.compiled and self.compiled_dir else None
+        if meta is not None and meta['source_version'] == version:
+            # mapped scorer of exactly these pickles, they are loaded only when needed
+            t0 = time.perf_counter()
+            scorer = load_scorer(self.compiled_dir, meta)
+            artifacts['compiled'] = {'file': self.compiled_dir, 'size_bytes': dir_size(self.compiled_dir),
+                                     'load_seconds': time.perf_counter() - t0, 'checksum': version}
+            objects = {name: LazyArtifact(self.path(name), self._timer(artifacts[name])) for name in self.files}
+        else:
+            objects = {}
+            for name in self.files:
+                t0 = time.perf_counter()
+                with open(self.path(name), 'rb') as f:
+                    objects[name] = pickle.load(f)
+                artifacts[name]['load_seconds'] = time.perf_counter() - t0
+            scorer = None
+            if self.compiled:
+                t0 = time.perf_counter()
+                try:
+                    scorer = export_scorer(objects['vectorizer'], objects['transformer'], objects['model'])
+                except (ValueError, AttributeError) as e:
+                    logger.warning("Cannot compile the fake news pipeline, using sklearn: %s", e)
+                self._metrics['compile_seconds'] = time.perf_counter() - t0
+        snapshot = Artifacts(objects['model'], objects['vectorizer'], objects['transformer'], version, scorer)
+        self._metrics['last_load_seconds'] = time.perf_counter() - started
+        self._metrics['artifacts'] = artifacts
+        return snapshot
+
+    @staticmethod
+    def _timer(info):
+        def record(seconds):
+            info['load_seconds'] = seconds
+        return record
+
+    def load(self):
+        """Load (or reload) all artifacts and return the new snapshot."""
+        with self._lock:
+            stats = self._stat()
+            checksums = {name: file_checksum(self.path(name)) for name in self.files}
+            self._snapshot = self._load(stats, checksums)
+            self._stats, self._checksums = stats, checksums
+            self._last_check = time.monotonic()
+            self._metrics['loads'] += 1
+            logger.info("Loaded fake news artifacts version %s in %.3fs",
+                        self._snapshot.version, self._metrics['last_load_seconds'])
+            return self._snapshot
+
+    def get(self):
+        """Return the current snapshot, loading or hot-reloading it if needed."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.load()
+        if self.check_interval >= 0 and time.monotonic() - self._last_check >= self.check_interval:
+            self._maybe_reload()
+        return self._snapshot
+
+    def _maybe_reload(self):
+        # only one thread checks, the others keep serving the current snapshot
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_check = time.monotonic()
+            stats = self._stat()
+            if stats == self._stats:
+                return
+            checksums = {name: file_checksum(self.path(name)) for name in self.files}
+            if checksums == self._checksums:
+                # touched but not changed
+                self._stats = stats
+                return
+            snapshot = self._load(stats, checksums)
+            self._snapshot = snapshot
+            self._stats, self._checksums = stats, checksums
+            self._metrics['reloads'] += 1
+            logger.info("Reloaded fake news artifacts, new version %s", snapshot.version)
+        except Exception:
+            # a half-written file must not take the worker down, keep the old snapshot
+            self._metrics['reload_errors'] += 1
+            logger.exception("Reloading fake news artifacts failed, keeping version %s",
+                             self._snapshot.version)
+        finally:
+            self._lock.release()
+
+    @property
+    def version(self):
+        return self.get().version
+
+    def metrics(self):
+        metrics = dict(self._metrics)
+        metrics['version'] = self._snapshot.version if self._snapshot else None
+        metrics['artifacts'] = {name: dict(info) for name, info in self._metrics['artifacts'].items()}
+        return metrics
+
+
+# the one registry of this worker
+registry = ModelRegistry()
@@ -0,0 +1,88 @@
+"""Batch scoring of news articles with the registry's artifacts.
+
+Rows are scored with the compiled linear scorer when the registry built
+one, otherwise all records of one call go through the vectorizer, the
+TF-IDF transformer and ``predict_proba`` as a single sparse matrix.
+"""
+import pandas as pd
+
+from fake_news_app.cache import prediction_cache
+from fake_news_app.instrumentation import stage
+from fake_news_app.registry import registry
+
+COLUMNS = ['title', 'author', 'text']
+LABELS = {0: "TRUE", 1: "FAKE"}
+
+
+class RecordError(ValueError):
+    """A submitted record is not a ``{title, author, text}`` object."""
+
+
+def clean_record(record):
+    if not isinstance(record, dict):
+        raise RecordError("record must be an object with title, author and text")
+    row = []
+    for column in COLUMNS:
+        value = record.get(column)
+        if value is None:
+            # the model was trained with missing fields filled with ' '
+            value = ' '
+        elif not isinstance(value, str):
+            raise RecordError("field '%s' must be a string" % column)
+        row.append(value)
+    return row
+
+
+def score_rows(rows, artifacts=None):
+    """Score ``[title, author, text]`` rows, returns ``(labels, probabilities)``.
+
+    ``probabilities`` is a list of ``{label: probability}`` dicts.
+    """
+    if artifacts is None:
+        with stage('load'):
+            artifacts = registry.get()
+    if not rows:
+        return [], []
+    if artifacts.scorer is not None:
+        with stage('compiled'):
+            return artifacts.scorer.score(rows, fallback=lambda unsure: score_rows_sklearn(unsure, artifacts))
+    return score_rows_sklearn(rows, artifacts)
+
+
+def score_rows_sklearn(rows, artifacts):
+    """Score rows with the pickled vectorizer, transformer and model."""
+    with stage('dataframe'):
+        df = pd.DataFrame(rows, columns=COLUMNS)
+    with stage('vectorize'):
+        vectorized = artifacts.vectorizer.transform(df)
+    with stage('tfidf'):
+        transformed = artifacts.transformer.transform(vectorized)
+    with stage('predict'):
+        proba = artifacts.model.predict_proba(transformed)
+    classes = [LABELS.get(int(c), str(c)) for c in artifacts.model.classes_]
+    best = proba.argmax(axis=1)
+    labels = [classes[i] for i in best]
+    probabilities = [dict(zip(classes, map(float, p))) for p in proba]
+    return labels, probabilities
+
+
+def score_rows_cached(rows, artifacts=None):
+    """Like ``score_rows``, but only rows missing from the prediction cache are scored."""
+    if artifacts is None:
+        with stage('load'):
+            artifacts = registry.get()
+    with stage('cache'):
+        results = [prediction_cache.get(row, artifacts.version) for row in rows]
+    missing = [i for i, found in enumerate(results) if found is None]
+    if missing:
+        labels, probabilities = score_rows([rows[i] for i in missing], artifacts)
+        for i, label, proba in zip(missing, labels, probabilities):
+            results[i] = (label, proba)
+            prediction_cache.set(rows[i], artifacts.version, results[i])
+    return [r[0] for r in results], [r[1] for r in results]
+
+
+def score_records(records, artifacts=None):
+    """Score a list of record dicts, returns one result dict per record."""
+    labels, probabilities = score_rows_cached([clean_record(r) for r in records], artifacts)
+    return [{'label': label, 'probabilities': proba} for label, proba in zip(labels, probabilities)]
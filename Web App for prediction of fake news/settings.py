@@ -41,19 +41,28 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'storages'
+    'storages',
+    # for the management commands of the project
+    'fake_news_app',
 ]
 
 MIDDLEWARE = [
+    'fake_news_app.instrumentation.StageTimingMiddleware',
+    'fake_news_app.lean.InferenceURLConfMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # the stock middleware, bypassed on INFERENCE_PATH_PREFIXES
+    'fake_news_app.lean.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'fake_news_app.lean.CsrfViewMiddleware',
+    'fake_news_app.lean.AuthenticationMiddleware',
+    'fake_news_app.lean.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Prediction routes served without sessions, CSRF, auth and messages
+INFERENCE_PATH_PREFIXES = ['/api/']
+INFERENCE_URLCONF = 'fake_news_app.inference_urls'
+
 ROOT_URLCONF = 'fake_news_app.urls'
 
 TEMPLATES = [
@@ -148,6 +157,33 @@ AWS_DEFAULT_ACL = None
 
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+# Batch scoring endpoint (api/predict/)
+FAKE_NEWS_BATCH_MAX_ROWS = 10000
+FAKE_NEWS_BATCH_MAX_BYTES = 50 * 1024 * 1024
+FAKE_NEWS_BATCH_CHUNK_SIZE = 256
+
+# Micro-batching of api/score/ under ASGI
+FAKE_NEWS_MICROBATCH_WINDOW_MS = 2
+FAKE_NEWS_MICROBATCH_MAX_BATCH = 64
+FAKE_NEWS_MICROBATCH_MAX_QUEUE = 1024
+FAKE_NEWS_MICROBATCH_TIMEOUT = 5.0
+
+# Prediction cache, set FAKE_NEWS_PREDICTION_CACHE_DB (e.g. BASE_DIR / 'prediction_cache.sqlite3')
+# to keep predictions on disk as well
+FAKE_NEWS_PREDICTION_CACHE_SIZE = 10000
+FAKE_NEWS_PREDICTION_CACHE_TTL = 24 * 3600
+FAKE_NEWS_PREDICTION_CACHE_DB = None
+
+# Token budget of the article text (head + tail window) before vectorization
+FAKE_NEWS_TEXT_TOKEN_BUDGET = 5000
+FAKE_NEWS_TEXT_HEAD_FRACTION = 0.5
+
+# Per-stage latency histograms on /metrics/ (local clients only), metrics_path of the Prometheus scrape job
+PREDICTION_METRICS = True
+PREDICTION_SLOW_REQUEST_SECONDS = 1.0
+PREDICTION_SLOW_REQUEST_SAMPLE_RATE = 0.1
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 django_heroku.settings(locals())
 
 
@@ -16,11 +16,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 # add this to import our views file
-from fake_news_app import views
+from fake_news_app import instrumentation, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # add these to configure our home page (default view) and result web page
     path('', views.home, name='home'),
-    path('result/', views.result, name='result')
+    path('result/', views.result, name='result'),
+    path('model/', views.model_info, name='model_info'),
+    path('metrics/', instrumentation.metrics, name='metrics'),
+    path('api/predict/', views.predict_batch, name='predict_batch'),
+    path('api/score/', views.predict_async, name='predict_async'),
+    path('api/article/', views.predict_article, name='predict_article'),
+    path('api/score/stats/', views.batcher_info, name='batcher_info'),
 ]
@@ -1,5 +1,37 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-import pandas as pd
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from fake_news_app.batching import QueueFull, get_batcher, served_over_asgi
+from fake_news_app.budget import apply_token_budget, read_budgeted
+from fake_news_app.cache import prediction_cache
+from fake_news_app.instrumentation import add_collector, stage
+from fake_news_app.registry import registry
+from fake_news_app.scoring import RecordError, clean_record, score_rows_cached
+
+# limits of the batch endpoint
+BATCH_MAX_ROWS = getattr(settings, 'FAKE_NEWS_BATCH_MAX_ROWS', 10000)
+BATCH_MAX_BYTES = getattr(settings, 'FAKE_NEWS_BATCH_MAX_BYTES', 50 * 1024 * 1024)
+BATCH_CHUNK_SIZE = getattr(settings, 'FAKE_NEWS_BATCH_CHUNK_SIZE', 256)
+
+
+def _registry_metrics():
+    metrics = registry.metrics()
+    for name, info in metrics.pop('artifacts').items():
+        metrics[name + '_size_bytes'] = info['size_bytes']
+        if info['load_seconds'] is not None:
+            metrics[name + '_load_seconds'] = info['load_seconds']
+    return metrics
+
+
+# exported on /metrics/ next to the stage histograms
+add_collector('fake_news_model', _registry_metrics)
+add_collector('fake_news_prediction_cache', prediction_cache.metrics)
 
 # our home page view
 def home(request):
@@ -7,27 +39,152 @@ def home(request):
 
 # custom method for generating predictions
 def getPredictions(Title, Author, Text):
-    import pickle
-    model = pickle.load(open("fake_news_model.sav", "rb"))
-    vectorizer = pickle.load(open("fake_news_vectorizer.sav", "rb"))
-    transformer = pickle.load(open("fake_news_transformer.sav", "rb"))
-    df = pd.DataFrame([[Title, Author, Text]], columns=['title', 'author', 'text'])
-    vectorized = vectorizer.transform(df)
-    prediction = model.predict(transformer.transform(vectorized))
-
-    if prediction == 0:
-        return "TRUE"
-    elif prediction == 1:
-        return "FAKE"
-    else:
-        return "error"
-
-# our result page view
+    labels, _ = score_rows_cached([[Title, Author, Text]])
+    return labels[0]
+
+# our result page view, the form is posted, GET links keep working
 def result(request):
-    Title = str(request.GET['title'])
-    Author = str(request.GET['author'])
-    Text = str(request.GET['text'])
+    params = request.POST if request.method == 'POST' else request.GET
+    Title = str(params['title'])
+    Author = str(params['author'])
+    with stage('budget'):
+        Text, budget = apply_token_budget(str(params['text']))
 
     result = getPredictions(Title, Author, Text)
 
-    return render(request, 'result.html', {'result': result})
\ No newline at end of file
+    with stage('render'):
+        return render(request, 'result.html', {'result': result, 'budget': budget})
+
+# load time, size and version of the loaded artifacts
+def model_info(request):
+    registry.get()
+    metrics = registry.metrics()
+    metrics['prediction_cache'] = prediction_cache.metrics()
+    return JsonResponse(metrics)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _score_json_array(rows):
+    # all rows are validated already, the array is written chunk by chunk
+    artifacts = registry.get()
+    yield '['
+    first = True
+    for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+        labels, probabilities = score_rows_cached(chunk, artifacts)
+        for label, proba in zip(labels, probabilities):
+            yield ('' if first else ',') + json.dumps({'label': label, 'probabilities': proba})
+            first = False
+    yield ']'
+
+
+def _ndjson_rows(request):
+    # (line number, row or error message) for every non-empty input line
+    count = 0
+    for number, line in enumerate(request, 1):
+        line = line.strip()
+        if not line:
+            continue
+        count += 1
+        if count > BATCH_MAX_ROWS:
+            yield number, "batch is limited to %d records" % BATCH_MAX_ROWS
+            return
+        try:
+            yield number, clean_record(json.loads(line))
+        except (ValueError, RecordError) as e:
+            yield number, str(e)
+
+
+def _score_ndjson(request):
+    # the request body is read lazily, so at most one chunk is in memory
+    artifacts = registry.get()
+    for chunk in _chunks(_ndjson_rows(request), BATCH_CHUNK_SIZE):
+        rows = [row for _, row in chunk if isinstance(row, list)]
+        labels, probabilities = score_rows_cached(rows, artifacts)
+        scored = iter(zip(labels, probabilities))
+        for number, row in chunk:
+            if isinstance(row, list):
+                label, proba = next(scored)
+                yield json.dumps({'line': number, 'label': label, 'probabilities': proba}) + '\n'
+            else:
+                yield json.dumps({'line': number, 'error': row}) + '\n'
+
+
+# batch scoring: JSON array or NDJSON stream of {title, author, text} records
+@csrf_exempt
+@require_POST
+def predict_batch(request):
+    content_type = request.content_type
+    if content_type in ('application/x-ndjson', 'application/jsonlines'):
+        return StreamingHttpResponse(_score_ndjson(request), content_type='application/x-ndjson')
+    if content_type != 'application/json':
+        return JsonResponse({'error': "use application/json or application/x-ndjson"}, status=415)
+
+    body = request.read(BATCH_MAX_BYTES + 1)
+    if len(body) > BATCH_MAX_BYTES:
+        return JsonResponse({'error': "request body is limited to %d bytes" % BATCH_MAX_BYTES}, status=413)
+    try:
+        records = json.loads(body)
+    except ValueError:
+        return JsonResponse({'error': "invalid JSON"}, status=400)
+    if not isinstance(records, list):
+        return JsonResponse({'error': "expected a JSON array of records"}, status=400)
+    if len(records) > BATCH_MAX_ROWS:
+        return JsonResponse({'error': "batch is limited to %d records" % BATCH_MAX_ROWS}, status=413)
+    try:
+        rows = [clean_record(record) for record in records]
+    except RecordError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    del records, body
+    return StreamingHttpResponse(_score_json_array(rows), content_type='application/json')
+
+
+# one article streamed as a text/plain body, title and author in the query string
+@csrf_exempt
+@require_POST
+def predict_article(request):
+    Text, budget = read_budgeted(request)
+    row = [request.GET.get('title', ' '), request.GET.get('author', ' '), Text]
+    labels, probabilities = score_rows_cached([row])
+    return JsonResponse({'label': labels[0], 'probabilities': probabilities[0], 'budget': budget})
+
+
+# single article scored through the micro-batcher with the ASGI entry point, on its own under WSGI
+async def predict_async(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': "use POST"}, status=405)
+    try:
+        row = clean_record(json.loads(request.body))
+    except (ValueError, RecordError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not served_over_asgi(request):
+        labels, probabilities = score_rows_cached([row])
+        return JsonResponse({'label': labels[0], 'probabilities': probabilities[0]})
+    try:
+        label, proba = await get_batcher().submit(row)
+    except QueueFull as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '1'
+        return response
+    except asyncio.TimeoutError:
+        return JsonResponse({'error': "prediction timed out"}, status=504)
+    return JsonResponse({'label': label, 'probabilities': proba})
+
+
+# csrf_exempt does not wrap async views on Django 3.1, mark it directly
+predict_async.csrf_exempt = True
+
+
+async def batcher_info(request):
+    if not served_over_asgi(request):
+        return JsonResponse({'batching': False, 'error': "micro-batching needs the ASGI entry point"})
+    return JsonResponse(get_batcher().metrics())
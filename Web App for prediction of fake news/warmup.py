@@ -0,0 +1,126 @@
+"""Warm-up of a fresh process before it takes traffic.
+
+``warm_up()`` sends a few synthetic requests through the complete Django
+stack (middleware, URL resolution, views, templates, budget and the
+compiled scorer) and scores their article with the sklearn pipeline, so
+lazy imports, template compilation and first call paths are paid for
+before a real user arrives. The prediction cache is off meanwhile: a
+worker forked from the warmed-up master would otherwise only hit the
+master's entries. gunicorn.conf.py runs it in the master after the app
+was preloaded and again in every worker before it accepts connections.
+Timings are kept in ``BOOT`` and exported on /metrics/.
+"""
+import io
+import json
+import logging
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from fake_news_app import instrumentation
+from fake_news_app.cache import prediction_cache
+
+logger = logging.getLogger(__name__)
+
+ROUNDS = int(os.environ.get('FAKE_NEWS_WARMUP_ROUNDS', 3))
+
+# process start as seen by the interpreter, set again after a fork
+BOOT = {'process_started': time.time()}
+
+ARTICLE = ("The minister said on Monday that the new rules would take effect next year, "
+           "after talks with regional officials and industry groups. ")
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _environ(method, path, query=None, body=b'', content_type=''):
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(query or {}),
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': _host(),
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': _host(),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+def _record(round_):
+    # a longer article every round
+    text = '%s Round %d.' % (ARTICLE * (20 + round_), round_)
+    return {'title': 'Warm-up %d' % round_, 'author': 'Staff', 'text': text}
+
+
+def _requests(record):
+    text = record['text']
+    return [
+        _environ('GET', '/'),
+        _environ('GET', '/result/', query=record),
+        _environ('POST', '/api/article/', query={'title': record['title']}, body=text.encode(),
+                 content_type='text/plain'),
+        _environ('POST', '/api/predict/', body=json.dumps([record, dict(record, author='')]).encode(),
+                 content_type='application/json'),
+    ]
+
+
+def warm_up(application=None, rounds=ROUNDS):
+    """Run ``rounds`` rounds of synthetic requests, returns the milliseconds of each round."""
+    if application is None:
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+    from fake_news_app.registry import registry
+    from fake_news_app.scoring import COLUMNS, score_rows_sklearn
+    started = time.perf_counter()
+    artifacts = registry.get()
+    durations = []
+    with prediction_cache.disabled():
+        for round_ in range(rounds):
+            round_started = time.perf_counter()
+            record = _record(round_)
+            for environ in _requests(record):
+                statuses = []
+                response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    if hasattr(response, 'close'):
+                        response.close()
+                if not statuses[0].startswith('200'):
+                    logger.warning("Warm-up request %s %s answered %s", environ['REQUEST_METHOD'],
+                                   environ['PATH_INFO'], statuses[0])
+            # the compiled scorer only hands the rows close to the decision boundary to sklearn
+            score_rows_sklearn([[record[column] for column in COLUMNS]], artifacts)
+            durations.append((time.perf_counter() - round_started) * 1000)
+    # the synthetic requests do not belong in the latency histograms or the cache counters
+    instrumentation.reset()
+    prediction_cache.reset_stats()
+    BOOT['warmup_seconds'] = time.perf_counter() - started
+    BOOT['warmup_first_round_ms'] = durations[0] if durations else None
+    BOOT['warmup_last_round_ms'] = durations[-1] if durations else None
+    return durations
+
+
+def _boot_metrics():
+    metrics = dict(BOOT)
+    metrics['uptime_seconds'] = time.time() - BOOT['process_started']
+    return metrics
+
+
+instrumentation.add_collector('fake_news_boot', _boot_metrics)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fake_news_app.settings')
 
 application = get_wsgi_application()
+
+# load the model artifacts before the first request (once in the master with gunicorn preload_app)
+from fake_news_app.registry import registry  # noqa: E402
+
+registry.load()
@@ -0,0 +1,83 @@
+"""Batch scoring of patient cohorts.
+
+Cohorts come as JSON objects or CSV rows in the layout of
+heart_failure_clinical_records_dataset.csv (extra columns such as ``time``
+and ``DEATH_EVENT`` are ignored). All rows of a chunk are coerced and
+validated column by column and scored with one forest call.
+"""
+import numpy as np
+import pandas as pd
+
+from .forest import FEATURES, get_forest
+from .instrumentation import stage
+
+FEATURE_NAMES = [name for name, _, _, _ in FEATURES]
+# anaemia, diabetes, high_blood_pressure, sex and smoking
+BINARY = np.array([low == 0 and high == 1 for _, low, high, _ in FEATURES])
+
+# validation codes of every value, see ERRORS
+OK, NOT_A_NUMBER, NEGATIVE, NOT_BINARY = range(4)
+ERRORS = {
+    NOT_A_NUMBER: "'%s' is missing or not a number",
+    NEGATIVE: "'%s' must not be negative",
+    NOT_BINARY: "'%s' must be 0 or 1",
+}
+
+
+class CohortError(ValueError):
+    """The uploaded cohort cannot be read at all (as opposed to single bad rows)."""
+
+
+def coerce(frame):
+    """Return ``(X, errors)`` for a DataFrame with the dataset columns.
+
+    ``X`` holds the float64 features of the valid rows in input order,
+    ``errors`` maps the position of every invalid row to its message.
+    """
+    missing = [name for name in FEATURE_NAMES if name not in frame.columns]
+    if missing:
+        raise CohortError("missing columns: %s" % ', '.join(missing))
+    values = np.column_stack([pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64)
+                              for name in FEATURE_NAMES]) if len(frame) else np.empty((0, len(FEATURES)))
+    codes = np.full(values.shape, OK, dtype=np.int8)
+    # comparisons with NaN are False, so NaN rows only get NOT_A_NUMBER
+    codes[BINARY & (values != 0) & (values != 1)] = NOT_BINARY
+    codes[values < 0] = NEGATIVE
+    codes[~np.isfinite(values)] = NOT_A_NUMBER
+    bad = codes.any(axis=1)
+    errors = {}
+    if bad.any():
+        first = (codes[bad] != OK).argmax(axis=1)
+        for position, column in zip(np.flatnonzero(bad), first):
+            errors[int(position)] = ERRORS[codes[position, column]] % FEATURE_NAMES[column]
+    return values[~bad], errors
+
+
+def score(X):
+    """Predicted class and class probabilities of every row of ``X``, in one forest call."""
+    forest = get_forest()
+    if not len(X):
+        return np.empty(0, dtype=forest.classes.dtype), np.empty((0, len(forest.classes)))
+    with stage('predict'):
+        proba = forest.predict_proba(X)
+    return forest.classes[proba.argmax(axis=1)], proba
+
+
+def score_frame(frame, offset=0):
+    """Score one chunk of a cohort, returns a DataFrame with one line per input row.
+
+    ``row`` numbers the rows of the upload from 0, ``offset`` is the number
+    of rows of the previous chunks. Invalid rows carry an ``error``.
+    """
+    with stage('validate'):
+        X, errors = coerce(frame)
+    predictions, proba = score(X)
+    classes = get_forest().classes
+    valid = np.ones(len(frame), dtype=bool)
+    valid[list(errors)] = False
+    result = pd.DataFrame({'row': np.arange(offset, offset + len(frame))})
+    result['prediction'] = pd.Series(predictions, index=np.flatnonzero(valid), dtype=object)
+    for index, cls in enumerate(classes):
+        result['proba_%s' % cls] = pd.Series(proba[:, index], index=np.flatnonzero(valid))
+    result['error'] = pd.Series(errors, dtype=object)
+    return result
@@ -0,0 +1,246 @@
+"""Flat, memory-mapped format of the heart failure forest.
+
+The nodes of all trees are stored in contiguous arrays (``feature``,
+``threshold``, ``left``, ``right`` and the normalized class ``proba`` of
+every node) next to the scaler's ``mean`` and ``scale``. Workers map the
+files read-only, so all gunicorn workers share one copy through the page
+cache instead of each holding its own unpickled forest.
+
+By default the scaler is folded into the split thresholds: every split
+compares the raw clinical input with the threshold it corresponds to, so
+predictions skip the transform and its allocation (``meta['folded']``).
+"""
+import functools
+import json
+import os
+import pickle
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+MODEL_FILE = 'heart-prediction-rfc-model.sav'
+SCALER_FILE = 's_scaler.sav'
+FOREST_DIR = os.environ.get('HEART_FOREST_DIR', 'heart_forest')
+
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'proba', 'roots', 'mean', 'scale']
+
+# input order of the form and the ranges seen in heart_failure_clinical_records_dataset.csv
+FEATURES = [
+    ('age', 40, 95, False),
+    ('anaemia', 0, 1, True),
+    ('creatinine_phosphokinase', 23, 7861, True),
+    ('diabetes', 0, 1, True),
+    ('ejection_fraction', 14, 80, True),
+    ('high_blood_pressure', 0, 1, True),
+    ('platelets', 25100, 850000, False),
+    ('serum_creatinine', 0.5, 9.4, False),
+    ('serum_sodium', 113, 148, True),
+    ('sex', 0, 1, True),
+    ('smoking', 0, 1, True),
+]
+
+
+def synthetic_patients(n, seed=42):
+    """Random patients within the dataset ranges, for verification and benchmarks."""
+    rng = np.random.RandomState(seed)
+    columns = []
+    for _, low, high, integer in FEATURES:
+        if integer:
+            columns.append(rng.randint(low, high + 1, size=n).astype(np.float64))
+        else:
+            columns.append(np.round(rng.uniform(low, high, size=n), 2))
+    return np.column_stack(columns)
+
+
+def _scaled(x, mean, scale):
+    # the scaled input as the pickled forest sees it
+    return ((x - mean) / scale).astype(np.float32)
+
+
+def fold_thresholds(feature, threshold, mean, scale):
+    """Raw-input thresholds of the splits of a forest trained on scaled inputs.
+
+    Scaling and the float32 cast are monotone, so ``float32((x - mean) /
+    scale) <= threshold`` holds exactly for ``x <= t`` up to the largest such
+    ``t``, which is found by bisecting between neighbouring float64 values.
+    """
+    mean = mean[feature]
+    scale = scale[feature]
+    estimate = threshold * scale + mean
+    width = scale * (np.abs(threshold) + 1.0) * 1e-5
+    low, high = estimate - width, estimate + width
+    # widen the brackets until _scaled(low) <= threshold < _scaled(high)
+    while True:
+        bad_low = _scaled(low, mean, scale) > threshold
+        bad_high = _scaled(high, mean, scale) <= threshold
+        if not (bad_low.any() or bad_high.any()):
+            break
+        width *= 2.0
+        low = np.where(bad_low, low - width, low)
+        high = np.where(bad_high, high + width, high)
+    while True:
+        middle = low + (high - low) / 2.0
+        open_ = (middle != low) & (middle != high)
+        if not open_.any():
+            return low
+        below = _scaled(middle, mean, scale) <= threshold
+        low = np.where(open_ & below, middle, low)
+        high = np.where(open_ & ~below, middle, high)
+
+
+def export_forest(model, scaler, directory, fold_scaler=True):
+    """Write a fitted RandomForestClassifier and its StandardScaler to ``directory``.
+
+    With ``fold_scaler`` the thresholds take raw inputs and no scaler is needed.
+    """
+    features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int32)
+        right = tree.children_right.astype(np.int32)
+        is_leaf = left < 0
+        # children become indexes into the concatenated node arrays, leaves stay -1
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        # same normalization as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        probas.append(value / normalizer)
+        roots.append(offset)
+        offset += tree.node_count
+
+    n_features = model.n_features_in_ if hasattr(model, 'n_features_in_') else model.n_features_
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'proba': np.concatenate(probas),
+        'roots': np.array(roots, dtype=np.int64),
+        'mean': np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        'scale': np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+    }
+    if fold_scaler:
+        split = arrays['left'] >= 0
+        arrays['threshold'][split] = fold_thresholds(arrays['feature'][split], arrays['threshold'][split],
+                                                     arrays['mean'], arrays['scale'])
+        arrays['mean'] = np.zeros(n_features)
+        arrays['scale'] = np.ones(n_features)
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), np.ascontiguousarray(array))
+    meta = {
+        'format': FORMAT_VERSION,
+        'n_features': int(n_features),
+        'n_trees': len(roots),
+        'n_nodes': int(offset),
+        'classes': [c.item() if hasattr(c, 'item') else c for c in model.classes_],
+        'folded': bool(fold_scaler),
+    }
+    # meta.json is written last, a directory without it is never loaded
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+class MappedForest:
+    """Scaler + forest evaluator over the memory-mapped node arrays.
+
+    All trees are traversed at once: ``node`` holds one position per
+    (tree, row) and every step moves all of them one level down. Leaves
+    point to themselves, so ``depth`` steps reach the leaf of every tree.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != FORMAT_VERSION:
+            raise ValueError("%s has an unknown forest format" % directory)
+        for name in ARRAYS:
+            # plain ndarray views of the maps, indexing np.memmap itself is much slower
+            setattr(self, name, np.asarray(np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')))
+        self.classes = np.array(self.meta['classes'])
+        self.n_features = self.meta['n_features']
+        # thresholds compare raw inputs, mean and scale are not applied
+        self.folded = self.meta.get('folded', False)
+        # (right, left) child of every node, indexed by ``x <= threshold``; leaves loop back to themselves
+        nodes = np.arange(len(self.left))
+        is_leaf = self.left < 0
+        self.children = np.column_stack([np.where(is_leaf, nodes, self.right),
+                                         np.where(is_leaf, nodes, self.left)]).astype(np.intp)
+        self.depth = self._depth(is_leaf)
+
+    def _depth(self, is_leaf):
+        depth = 0
+        frontier = self.roots
+        while True:
+            frontier = frontier[~is_leaf[frontier]]
+            if not len(frontier):
+                return depth
+            frontier = self.children[frontier].ravel()
+            depth += 1
+
+    def transform(self, X):
+        # StandardScaler.transform, then float32 as sklearn compares float32 features with float64 thresholds
+        if self.folded:
+            return np.asarray(X, dtype=np.float64)
+        return ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+
+    def leaves(self, X):
+        """Leaf index of every tree (rows) for every sample (columns) of transformed ``X``."""
+        n = len(X)
+        # position of sample j's feature f in the flattened X
+        row_offsets = np.arange(n) * self.n_features
+        X = X.ravel()
+        node = np.repeat(self.roots.astype(np.intp)[:, np.newaxis], n, axis=1)
+        for _ in range(self.depth):
+            go_left = X[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = self.children[node, go_left.view(np.int8)]
+        return node
+
+    def predict_proba(self, X):
+        X = self.transform(np.atleast_2d(X))
+        leaf_proba = self.proba[self.leaves(X)]
+        # summed tree by tree like RandomForestClassifier.predict_proba
+        proba = leaf_proba[0].copy()
+        for tree_proba in leaf_proba[1:]:
+            proba += tree_proba
+        proba /= len(leaf_proba)
+        return proba
+
+    def predict(self, X):
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+
+class PickledForest:
+    """The two pickled artifacts behind the same interface as ``MappedForest``."""
+
+    def __init__(self, model_file=MODEL_FILE, scaler_file=SCALER_FILE):
+        with open(model_file, 'rb') as f:
+            self.model = pickle.load(f)
+        with open(scaler_file, 'rb') as f:
+            self.scaler = pickle.load(f)
+        self.classes = self.model.classes_
+
+    def transform(self, X):
+        return self.scaler.transform(X)
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(self.transform(X))
+
+    def predict(self, X):
+        return self.model.predict(self.transform(X))
+
+
+@functools.lru_cache(maxsize=None)
+def get_forest(directory=FOREST_DIR):
+    """The forest of this worker, mapped if ``manage.py export_forest`` was run."""
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        return MappedForest(directory)
+    return PickledForest()
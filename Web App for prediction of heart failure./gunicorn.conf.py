@@ -0,0 +1,36 @@
+"""gunicorn settings of the heart failure app, see the Procfile.
+
+The app is imported and the forest is loaded once in the master
+(``preload_app``) and the workers are forked from it, so they start with
+everything imported and share the loaded pages. The warm-up runs in the
+master before the first fork and again in every worker before it accepts
+connections; both report how long they took to boot.
+"""
+import time
+
+# about the start of the master, this file is read first
+_started = time.perf_counter()
+
+preload_app = True
+
+
+def when_ready(server):
+    from heart_app import warmup
+    durations = warmup.warm_up(server.app.wsgi())
+    warmup.BOOT['master_ready_seconds'] = time.perf_counter() - _started
+    server.log.info("Master ready in %.2fs, warm-up rounds: %s ms", warmup.BOOT['master_ready_seconds'],
+                    ', '.join('%.1f' % ms for ms in durations))
+
+
+def post_fork(server, worker):
+    from heart_app import warmup
+    warmup.BOOT['process_started'] = time.time()
+    worker.forked = time.perf_counter()
+
+
+def post_worker_init(worker):
+    from heart_app import warmup
+    durations = warmup.warm_up(worker.wsgi)
+    warmup.BOOT['worker_ready_seconds'] = time.perf_counter() - worker.forked
+    worker.log.info("Worker %s ready %.3fs after fork, warm-up rounds: %s ms", worker.pid,
+                    warmup.BOOT['worker_ready_seconds'], ', '.join('%.1f' % ms for ms in durations))
@@ -0,0 +1,12 @@
+"""URLconf of the inference routes, see heart_app.lean.
+
+Only the prediction routes are mapped here, so these requests resolve
+without the admin and the home page.
+"""
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('api/predict/', views.predict_batch, name='predict_batch'),
+]
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from heart_app.forest import FOREST_DIR, MappedForest, PickledForest, export_forest, synthetic_patients
+
+
+def per_call(predict, X, repeat):
+    # one warm-up call, then microseconds per call
+    predict(X)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        predict(X)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare the flattened forest evaluator with the pickled sklearn forest (results and latency)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forest', default=FOREST_DIR,
+                            help="exported forest, the pickles are exported to a temporary directory if missing")
+        parser.add_argument('--rows', type=int, default=10000, help="synthetic patients to verify and score")
+        parser.add_argument('--repeat', type=int, default=1000, help="single-row calls to time")
+
+    def handle(self, *args, **options):
+        pickled = PickledForest()
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = options['forest']
+            if not os.path.exists(os.path.join(directory, 'meta.json')):
+                directory = tmp
+                export_forest(pickled.model, pickled.scaler, directory)
+            mapped = MappedForest(directory)
+
+            X = synthetic_patients(options['rows'])
+            if not np.array_equal(pickled.predict_proba(X), mapped.predict_proba(X)):
+                raise CommandError("probabilities of the flattened forest differ from the pickled forest")
+            if not np.array_equal(pickled.predict(X), mapped.predict(X)):
+                raise CommandError("predictions of the flattened forest differ from the pickled forest")
+            self.stdout.write("identical predictions and probabilities on %d patients (%d trees, depth %d)"
+                              % (len(X), mapped.meta['n_trees'], mapped.depth))
+
+            row = X[:1]
+            self.stdout.write("%-10s %16s %16s" % ('', 'us/call (1 row)', 'us/row (batch)'))
+            for name, forest in (('sklearn', pickled), ('flattened', mapped)):
+                single = per_call(forest.predict, row, options['repeat'])
+                batch = per_call(forest.predict, X, 3) / len(X)
+                self.stdout.write("%-10s %16.1f %16.2f" % (name, single, batch))
@@ -0,0 +1,66 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# the lean middleware and the stock classes they bypass
+STOCK = {
+    'heart_app.lean.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'heart_app.lean.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'heart_app.lean.AuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'heart_app.lean.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+PATIENT = {'age': 65, 'anaemia': 0, 'creatinine_phosphokinase': 146, 'diabetes': 0, 'ejection_fraction': 20,
+           'high_blood_pressure': 0, 'platelets': 162000, 'serum_creatinine': 1.3, 'serum_sodium': 129,
+           'sex': 1, 'smoking': 1}
+
+
+def stock_middleware():
+    return [STOCK.get(path, path) for path in settings.MIDDLEWARE
+            if path != 'heart_app.lean.InferenceURLConfMiddleware']
+
+
+class Command(BaseCommand):
+    help = "Per-request overhead of the full middleware stack versus the lean inference path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/predict/',
+                            help="inference route to POST a one-patient cohort to")
+        parser.add_argument('--requests', type=int, default=2000, help="requests per round")
+        parser.add_argument('--rounds', type=int, default=5, help="rounds per stack, the median is reported")
+
+    def handle(self, *args, **options):
+        profiles = [('stock', stock_middleware()), ('lean', list(settings.MIDDLEWARE))]
+        results = {}
+        for name, middleware in profiles:
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                response = self._request(client, options['path'])
+                if response.status_code != 200:
+                    raise CommandError("%s %s answered %d" % (name, options['path'], response.status_code))
+                with CaptureQueriesContext(connection) as queries:
+                    self._request(client, options['path'])
+                rounds = []
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        self._request(client, options['path'])
+                    rounds.append((time.perf_counter() - started) / options['requests'] * 1e6)
+            results[name] = (statistics.median(rounds), len(queries), len(middleware))
+
+        self.stdout.write("%-6s %12s %12s %12s" % ('', 'middleware', 'us/request', 'db queries'))
+        for name, (us, queries, count) in results.items():
+            self.stdout.write("%-6s %12d %12.1f %12d" % (name, count, us, queries))
+        self.stdout.write("removed: %.1f us per request" % (results['stock'][0] - results['lean'][0]))
+
+    def _request(self, client, path):
+        response = client.post(path, json.dumps([PATIENT]), content_type='application/json')
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return response
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from heart_app.forest import FOREST_DIR, MappedForest, PickledForest, export_forest, synthetic_patients
+
+
+def validation_grid(forest, n_base=8, seed=7):
+    """Synthetic patients with every split feature set to its threshold and both neighbouring values."""
+    split = forest.left >= 0
+    base = synthetic_patients(n_base, seed)
+    raw = forest.threshold[split]
+    if not forest.folded:
+        # the exported thresholds are in the scaled space
+        raw = raw * forest.scale[forest.feature[split]] + forest.mean[forest.feature[split]]
+    blocks = []
+    for feature, threshold in zip(forest.feature[split], raw):
+        for value in (np.nextafter(threshold, -np.inf), threshold, np.nextafter(threshold, np.inf)):
+            block = base.copy()
+            block[:, feature] = value
+            blocks.append(block)
+    return np.vstack(blocks) if blocks else base
+
+
+class Command(BaseCommand):
+    help = ("Compile the pickled scaler and forest into one flat memory-mapped artifact "
+            "that takes raw clinical inputs (scaler folded into the split thresholds).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=FOREST_DIR, help="target directory")
+        parser.add_argument('--check-rows', type=int, default=20000, help="random synthetic patients to verify")
+        parser.add_argument('--keep-scaler', action='store_true',
+                            help="store the scaler next to the forest instead of folding it into the thresholds")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pickled = PickledForest()
+        export_forest(pickled.model, pickled.scaler, options['output'], fold_scaler=not options['keep_scaler'])
+        mapped = MappedForest(options['output'])
+
+        # random patients plus a grid on both sides of every split
+        X = np.vstack([synthetic_patients(options['check_rows']), validation_grid(mapped)])
+        expected = pickled.predict_proba(X)
+        got = mapped.predict_proba(X)
+        labels_differ = int((pickled.predict(X) != mapped.predict(X)).sum())
+        if labels_differ or not np.array_equal(expected, got):
+            raise CommandError("exported forest differs on %d of %d patients" % (labels_differ, len(X)))
+
+        self.stdout.write("exported %d trees / %d nodes to %s (%s) in %.2fs, verified on %d patients" % (
+            mapped.meta['n_trees'], mapped.meta['n_nodes'], options['output'],
+            'scaler folded' if mapped.folded else 'with scaler', time.perf_counter() - started, len(X)))
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.model_selection import ParameterGrid, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from heart_app.forest import synthetic_patients
+from heart_app.model_search import candidates, default_models, grid_search_loop, search, timed
+
+DATASET = 'heart_failure_clinical_records_dataset.csv'
+
+
+def load_training_set(path, synthetic=0):
+    """X_train and y_train prepared as in b_heart_app.ipynb: without ``time``, stratified 75 %, scaled."""
+    if synthetic:
+        X = synthetic_patients(synthetic, seed=42)
+        # a noisy label that depends on age, ejection fraction and serum creatinine
+        z = (X - X.mean(axis=0)) / X.std(axis=0)
+        noise = np.random.RandomState(42).normal(0, 1, len(X))
+        y = (z[:, 0] - z[:, 4] + z[:, 7] + noise > 1).astype(int)
+    else:
+        if not os.path.exists(path):
+            raise CommandError("%s not found, pass --csv or --synthetic" % path)
+        df = pd.read_csv(path).drop(columns='time')
+        X = df.drop(columns='DEATH_EVENT').to_numpy(dtype=np.float64)
+        y = df['DEATH_EVENT'].to_numpy()
+    X_train, _, y_train, _ = train_test_split(X, y, stratify=y, test_size=0.25, random_state=42)
+    return StandardScaler().fit_transform(X_train), y_train
+
+
+class Command(BaseCommand):
+    help = "Search the models of the notebook's find_best_model on one process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=DATASET, help="heart failure clinical records")
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help="search synthetic patients with a synthetic label instead of the csv")
+        parser.add_argument('--halving', action='store_true', help="eliminate weak candidates early")
+        parser.add_argument('--factor', type=int, default=3, help="halving: 1/factor of the candidates survive")
+        parser.add_argument('--min-folds', type=int, default=2, help="halving: folds of the first rung")
+        parser.add_argument('--jobs', type=int, default=None, help="worker processes, all cores by default")
+        parser.add_argument('--compare', action='store_true',
+                            help="also run the sequential GridSearchCV loop and compare")
+
+    def handle(self, *args, **options):
+        X, y = load_training_set(options['csv'], options['synthetic'])
+        models = default_models()
+        full = sum(len(ParameterGrid(grid)) for _, grid in models.values())
+        unique = sum(len(candidates(estimator, grid)) for estimator, grid in models.values())
+        self.stdout.write("%d patients, %d candidates, %d without duplicates" % (len(X), full, unique))
+
+        (best, results), seconds = timed(search, X, y, models, halving=options['halving'],
+                                         factor=options['factor'], min_folds=options['min_folds'],
+                                         jobs=options['jobs'])
+        self.stdout.write(best.to_string(index=False))
+        self.stdout.write("search: %.2f s, %d fits" % (seconds, results['folds'].sum()))
+
+        if options['compare']:
+            expected, loop_seconds = timed(grid_search_loop, X, y, models)
+            self.stdout.write("GridSearchCV loop: %.2f s, %d fits, %.1fx slower"
+                              % (loop_seconds, full * 10, loop_seconds / seconds))
+            differ = [row.model for row, other in zip(best.itertuples(), expected.itertuples())
+                      if row.best_parameters != other.best_parameters or row.score != other.score]
+            if differ:
+                self.stdout.write("different best candidates: %s" % ', '.join(differ))
+                self.stdout.write(expected.to_string(index=False))
+            else:
+                self.stdout.write("same best parameters and scores as the GridSearchCV loop")
@@ -0,0 +1,192 @@
+"""Model selection for the heart failure data.
+
+``find_best_model`` of b_heart_app.ipynb as an importable engine:
+
+* candidates that only differ in a parameter their estimator ignores
+  (``degree`` unless ``kernel='poly'``, ...) are evaluated once,
+* the CV folds and, with ``scale=True``, the per-fold scaled matrices are
+  computed once and sent to every worker once,
+* the (candidate, fold) fits of all models run on one shared process pool,
+* with ``halving=True`` candidates are evaluated on a few folds first and
+  only the best ``1 / factor`` of every model get more folds, until the
+  survivors have seen all of them.
+
+Exhaustive search gives the same best parameters and scores as running
+``GridSearchCV(cv=10)`` model after model; ``grid_search_loop`` is that
+loop, kept for comparison.
+"""
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV, ParameterGrid, StratifiedKFold
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+
+def default_models():
+    """The models and grids of the notebook's ``find_best_model``."""
+    return {
+        'logistic_regression': (LogisticRegression(random_state=42, n_jobs=-1),
+                                {'C': [0.1, 0.5, 1, 5, 10]}),
+        'knn': (KNeighborsClassifier(n_jobs=-1),
+                {'n_neighbors': [3, 5, 7, 9, 11, 13]}),
+        'decision_tree': (DecisionTreeClassifier(random_state=42),
+                          {'criterion': ['gini', 'entropy'], 'max_depth': [5, 10]}),
+        'random_forest': (RandomForestClassifier(random_state=42, n_jobs=-1),
+                          {'n_estimators': [10, 15, 20, 50, 100, 200]}),
+        'svm': (SVC(random_state=42),
+                {'C': [0.1, 0.5, 1, 5, 10, 20, 30], 'kernel': ['rbf', 'linear', 'poly', 'sigmoid'],
+                 'degree': [3, 5, 7, 9]}),
+    }
+
+
+# parameter -> whether it changes the fitted model, given all parameters of the estimator
+RELEVANT = {
+    SVC: {
+        'degree': lambda p: p['kernel'] == 'poly',
+        'gamma': lambda p: p['kernel'] != 'linear',
+        'coef0': lambda p: p['kernel'] in ('poly', 'sigmoid'),
+    },
+    LogisticRegression: {
+        'l1_ratio': lambda p: p['penalty'] == 'elasticnet',
+    },
+}
+
+
+def candidates(estimator, grid):
+    """``ParameterGrid(grid)`` without the combinations that fit an identical model.
+
+    The first combination of every group of duplicates is kept, which is
+    the one ``GridSearchCV`` would report on a tie.
+    """
+    rules = RELEVANT.get(type(estimator), {})
+    defaults = estimator.get_params()
+    seen = set()
+    unique = []
+    for params in ParameterGrid(grid):
+        merged = dict(defaults, **params)
+        key = tuple(sorted((name, repr(value)) for name, value in params.items()
+                           if name not in rules or rules[name](merged)))
+        if key not in seen:
+            seen.add(key)
+            unique.append(params)
+    return unique
+
+
+def prepare_folds(X, y, cv=10, scale=False):
+    """``(X_train, y_train, X_test, y_test)`` of every fold, as ``GridSearchCV(cv=cv)`` splits them."""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    folds = []
+    for train, test in StratifiedKFold(n_splits=cv).split(X, y):
+        X_train, X_test = X[train], X[test]
+        if scale:
+            scaler = StandardScaler().fit(X_train)
+            X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+        folds.append((X_train, y[train], X_test, y[test]))
+    return folds
+
+
+# folds of this worker process, set once by _init_worker
+_folds = None
+
+
+def _init_worker(folds):
+    global _folds
+    _folds = folds
+
+
+def _fit_score(estimator, params, fold):
+    X_train, y_train, X_test, y_test = _folds[fold]
+    model = clone(estimator).set_params(**params)
+    model.fit(X_train, y_train)
+    return model.score(X_test, y_test)
+
+
+def _single_threaded(estimator):
+    # the pool already uses every core
+    if 'n_jobs' in estimator.get_params():
+        return clone(estimator).set_params(n_jobs=1)
+    return estimator
+
+
+def search(X, y, models=None, cv=10, scale=False, halving=False, factor=3, min_folds=2, jobs=None):
+    """Best parameters and mean CV accuracy of every model.
+
+    Returns ``(best, results)``: ``best`` has the notebook's ``model``,
+    ``best_parameters`` and ``score`` columns, ``results`` one line per
+    evaluated candidate with the folds it was scored on.
+    """
+    models = default_models() if models is None else models
+    folds = prepare_folds(X, y, cv, scale)
+    estimators = {name: _single_threaded(estimator) for name, (estimator, _) in models.items()}
+    grids = {name: candidates(estimator, grid) for name, (estimator, grid) in models.items()}
+    scores = {name: [[] for _ in grid] for name, grid in grids.items()}
+    alive = {name: list(range(len(grid))) for name, grid in grids.items()}
+
+    done = 0
+    target = min(min_folds, cv) if halving else cv
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(folds,)) as pool:
+        while True:
+            # one rung: the next folds of every surviving candidate of every model
+            futures = {}
+            for name, indexes in alive.items():
+                for index in indexes:
+                    for fold in range(done, target):
+                        future = pool.submit(_fit_score, estimators[name], grids[name][index], fold)
+                        futures[future] = (name, index, fold)
+            rung = {}
+            for future in as_completed(futures):
+                rung[futures[future]] = future.result()
+            # kept in fold order so the means are computed like GridSearchCV's
+            for (name, index, fold) in sorted(rung, key=lambda key: key[2]):
+                scores[name][index].append(rung[name, index, fold])
+            done = target
+            if done >= cv:
+                break
+            for name, indexes in alive.items():
+                keep = max(1, math.ceil(len(indexes) / factor))
+                # stable sort, so ties keep the grid order
+                ranked = sorted(indexes, key=lambda index: -np.mean(scores[name][index]))
+                alive[name] = sorted(ranked[:keep])
+            target = min(cv, done * factor)
+
+    rows, best = [], []
+    for name, grid in grids.items():
+        means = {}
+        for index, params in enumerate(grid):
+            fold_scores = scores[name][index]
+            mean = np.mean(fold_scores)
+            rows.append({'model': name, 'parameters': params, 'folds': len(fold_scores),
+                         'mean_score': mean, 'std_score': np.std(fold_scores)})
+            if len(fold_scores) == cv:
+                means[index] = mean
+        winner = max(means, key=lambda index: (means[index], -index))
+        best.append({'model': name, 'best_parameters': grid[winner], 'score': means[winner]})
+    return (pd.DataFrame(best, columns=['model', 'best_parameters', 'score']),
+            pd.DataFrame(rows, columns=['model', 'parameters', 'folds', 'mean_score', 'std_score']))
+
+
+def grid_search_loop(X, y, models=None, cv=10):
+    """The notebook's loop: one ``GridSearchCV`` per model, one after another."""
+    models = default_models() if models is None else models
+    scores = []
+    for name, (estimator, grid) in models.items():
+        search_ = GridSearchCV(estimator, grid, cv=cv, n_jobs=-1)
+        search_.fit(X, y)
+        scores.append({'model': name, 'best_parameters': search_.best_params_, 'score': search_.best_score_})
+    return pd.DataFrame(scores, columns=['model', 'best_parameters', 'score'])
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
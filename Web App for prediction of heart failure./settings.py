@@ -38,19 +38,28 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'storages'
+    'storages',
+    # for the management commands of the project
+    'heart_app',
 ]
 
 MIDDLEWARE = [
+    'heart_app.instrumentation.StageTimingMiddleware',
+    'heart_app.lean.InferenceURLConfMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # the stock middleware, bypassed on INFERENCE_PATH_PREFIXES
+    'heart_app.lean.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'heart_app.lean.CsrfViewMiddleware',
+    'heart_app.lean.AuthenticationMiddleware',
+    'heart_app.lean.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Prediction routes served without sessions, CSRF, auth and messages
+INFERENCE_PATH_PREFIXES = ['/api/']
+INFERENCE_URLCONF = 'heart_app.inference_urls'
+
 ROOT_URLCONF = 'heart_app.urls'
 
 TEMPLATES = [
@@ -122,6 +131,17 @@ USE_TZ = True
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
 
+# Per-stage latency histograms on /metrics/ (local clients only), metrics_path of the Prometheus scrape job
+PREDICTION_METRICS = True
+PREDICTION_SLOW_REQUEST_SECONDS = 1.0
+PREDICTION_SLOW_REQUEST_SAMPLE_RATE = 0.1
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Cohort scoring on api/predict/
+HEART_BATCH_MAX_ROWS = 100000
+HEART_BATCH_MAX_BYTES = 20 * 1024 * 1024
+HEART_BATCH_CHUNK_SIZE = 5000
+
 django_heroku.settings(locals())
 
 AWS_ACCES_KEY_ID = os.environ.get('AWS_ACCES_KEY_ID')
@@ -19,7 +19,7 @@ from django.contrib import admin
 from django.urls import path
 
 # add this to import our views file
-from . import views
+from . import instrumentation, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +27,12 @@ urlpatterns = [
     # add these to configure our home page (default view) and result web page
     path('', views.home, name='home'),
     path('result/', views.result, name='result'),
+
+    # cohorts as JSON or CSV, one forest call per chunk
+    path('api/predict/', views.predict_batch, name='predict_batch'),
+
+    # per-stage latency histograms for local scrapers
+    path('metrics/', instrumentation.metrics, name='metrics'),
 ]
 
 
@@ -1,4 +1,19 @@
+import json
+
+import pandas as pd
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .cohort import FEATURE_NAMES, CohortError, score_frame
+from .forest import get_forest
+from .instrumentation import stage
+
+BATCH_MAX_ROWS = getattr(settings, 'HEART_BATCH_MAX_ROWS', 100000)
+BATCH_MAX_BYTES = getattr(settings, 'HEART_BATCH_MAX_BYTES', 20 * 1024 * 1024)
+BATCH_CHUNK_SIZE = getattr(settings, 'HEART_BATCH_CHUNK_SIZE', 5000)
 
 # our home page view
 def home(request):
@@ -7,12 +22,14 @@ def home(request):
 # custom method for generating predictions
 def getPredictions(Age, Anaemia, Creatinine_phosphokinase, Diabetes, Ejection_fraction, High_blood_pressure, Platelets,
                    Serum_creatinine, Serum_sodium, Sex, Smoking):
-    import pickle
-    model = pickle.load(open("heart-prediction-rfc-model.sav", "rb"))
-    scaled = pickle.load(open("s_scaler.sav", "rb"))
-    prediction = model.predict(scaled.transform([[Age, Anaemia, Creatinine_phosphokinase, Diabetes, Ejection_fraction,
-                                                    High_blood_pressure, Platelets, Serum_creatinine, Serum_sodium,
-                                                    Sex, Smoking]]))
+    # loaded once per worker: one memory-mapped forest taking raw inputs after manage.py export_forest,
+    # otherwise the pickled scaler and forest
+    with stage('load'):
+        forest = get_forest()
+    with stage('predict'):
+        prediction = forest.predict([[Age, Anaemia, Creatinine_phosphokinase, Diabetes, Ejection_fraction,
+                                      High_blood_pressure, Platelets, Serum_creatinine, Serum_sodium,
+                                      Sex, Smoking]])
 
     if prediction == 0:
         return "Great! You don't have heart failure."
@@ -38,4 +55,95 @@ def result(request):
     result = getPredictions(Age, Anaemia, Creatinine_phosphokinase, Diabetes, Ejection_fraction, High_blood_pressure,
                             Platelets, Serum_creatinine, Serum_sodium, Sex, Smoking)
 
-    return render(request, 'result.html', {'result': result})
\ No newline at end of file
+    with stage('render'):
+        return render(request, 'result.html', {'result': result})
+
+
+# cohort scoring: JSON array of patients, or CSV in the dataset layout (raw body or 'file' upload)
+@csrf_exempt
+@require_POST
+def predict_batch(request):
+    content_type = request.content_type
+    if content_type == 'application/json':
+        return _json_batch(request)
+    if content_type in ('text/csv', 'application/csv'):
+        return _csv_batch(request)
+    if content_type == 'multipart/form-data' and 'file' in request.FILES:
+        return _csv_batch(request.FILES['file'])
+    return JsonResponse({'error': "use application/json, text/csv or a multipart 'file' upload"}, status=415)
+
+
+def _json_batch(request):
+    body = request.read(BATCH_MAX_BYTES + 1)
+    if len(body) > BATCH_MAX_BYTES:
+        return JsonResponse({'error': "request body is limited to %d bytes" % BATCH_MAX_BYTES}, status=413)
+    try:
+        records = json.loads(body)
+    except ValueError:
+        return JsonResponse({'error': "invalid JSON"}, status=400)
+    if not isinstance(records, list):
+        return JsonResponse({'error': "expected a JSON array of patients"}, status=400)
+    if len(records) > BATCH_MAX_ROWS:
+        return JsonResponse({'error': "batch is limited to %d patients" % BATCH_MAX_ROWS}, status=413)
+    if not all(isinstance(record, dict) for record in records):
+        return JsonResponse({'error': "every patient must be an object"}, status=400)
+    with stage('parse'):
+        # missing fields become NaN and are reported per row
+        frame = pd.DataFrame.from_records(records, columns=FEATURE_NAMES)
+    del records, body
+    result = score_frame(frame)
+    return StreamingHttpResponse(_json_lines(result), content_type='application/json')
+
+
+def _json_lines(result):
+    # the whole cohort was scored in one call, only the serialization is streamed
+    proba_columns = [column for column in result.columns if column.startswith('proba_')]
+    yield '['
+    for start in range(0, len(result), BATCH_CHUNK_SIZE):
+        chunk = result.iloc[start:start + BATCH_CHUNK_SIZE]
+        lines = []
+        for row, prediction, error, *proba in zip(chunk['row'].tolist(), chunk['prediction'].tolist(),
+                                                   chunk['error'].tolist(),
+                                                   *(chunk[column].tolist() for column in proba_columns)):
+            if isinstance(error, str):
+                lines.append(json.dumps({'row': row, 'error': error}))
+            else:
+                probabilities = {column[len('proba_'):]: p for column, p in zip(proba_columns, proba)}
+                lines.append(json.dumps({'row': row, 'prediction': int(prediction),
+                                         'probabilities': probabilities}))
+        yield ('' if start == 0 else ',') + ','.join(lines)
+    yield ']'
+
+
+def _csv_batch(source):
+    # only the dataset's feature columns are parsed, one chunk at a time
+    try:
+        with stage('parse'):
+            reader = pd.read_csv(source, chunksize=BATCH_CHUNK_SIZE, usecols=lambda c: c in FEATURE_NAMES)
+            first = next(reader, None)
+        if first is None:
+            raise CohortError("no rows")
+        result = score_frame(first)
+    except (CohortError, ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': "cannot read the CSV: %s" % e}, status=400)
+    return StreamingHttpResponse(_csv_lines(reader, result), content_type='text/csv')
+
+
+def _csv_lines(reader, result):
+    yield result.to_csv(index=False)
+    rows = len(result)
+    while True:
+        try:
+            chunk = next(reader, None)
+        except (ValueError, UnicodeDecodeError) as e:
+            # the status line is sent already, report in the body
+            yield '# error: cannot read the CSV after row %d: %s\n' % (rows - 1, e)
+            return
+        if chunk is None:
+            return
+        if rows + len(chunk) > BATCH_MAX_ROWS:
+            yield '# error: batch is limited to %d patients\n' % BATCH_MAX_ROWS
+            return
+        result = score_frame(chunk, offset=rows)
+        rows += len(chunk)
+        yield result.to_csv(index=False, header=False)
@@ -0,0 +1,108 @@
+"""Warm-up of a fresh process before it takes traffic.
+
+``warm_up()`` sends a few synthetic requests through the complete Django
+stack (middleware, URL resolution, views, templates and the forest), so
+lazy imports, template compilation and first call paths are paid for
+before a real user arrives. The patients are drawn per process, so every
+worker walks other paths of the forest than the master did.
+gunicorn.conf.py runs it in the master after the app was preloaded and
+again in every worker before it accepts connections. Timings are kept in
+``BOOT`` and exported on /metrics/.
+"""
+import io
+import json
+import logging
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from . import instrumentation
+from .forest import FEATURES, get_forest, synthetic_patients
+
+logger = logging.getLogger(__name__)
+
+ROUNDS = int(os.environ.get('HEART_WARMUP_ROUNDS', 3))
+
+# process start as seen by the interpreter, set again after a fork
+BOOT = {'process_started': time.time()}
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _environ(method, path, query=None, body=b'', content_type=''):
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(query or {}),
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': _host(),
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': _host(),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+def _requests(round_):
+    # the form sends the integer fields without a decimal point
+    patients = [{name: int(value) if integer else value for (name, _, _, integer), value in zip(FEATURES, row)}
+                for row in synthetic_patients(4, seed=[os.getpid(), round_]).tolist()]
+    return [
+        _environ('GET', '/'),
+        _environ('GET', '/result/', query=patients[0]),
+        _environ('POST', '/api/predict/', body=json.dumps(patients).encode(), content_type='application/json'),
+    ]
+
+
+def warm_up(application=None, rounds=ROUNDS):
+    """Run ``rounds`` rounds of synthetic requests, returns the milliseconds of each round."""
+    if application is None:
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+    started = time.perf_counter()
+    get_forest()
+    durations = []
+    for round_ in range(rounds):
+        round_started = time.perf_counter()
+        for environ in _requests(round_):
+            statuses = []
+            response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+            if not statuses[0].startswith('200'):
+                logger.warning("Warm-up request %s %s answered %s", environ['REQUEST_METHOD'],
+                               environ['PATH_INFO'], statuses[0])
+        durations.append((time.perf_counter() - round_started) * 1000)
+    # the synthetic requests do not belong in the latency histograms
+    instrumentation.reset()
+    BOOT['warmup_seconds'] = time.perf_counter() - started
+    BOOT['warmup_first_round_ms'] = durations[0] if durations else None
+    BOOT['warmup_last_round_ms'] = durations[-1] if durations else None
+    return durations
+
+
+def _boot_metrics():
+    metrics = dict(BOOT)
+    metrics['uptime_seconds'] = time.time() - BOOT['process_started']
+    return metrics
+
+
+instrumentation.add_collector('heart_boot', _boot_metrics)
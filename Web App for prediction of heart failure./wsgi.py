@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'heart_app.settings')
 
 application = get_wsgi_application()
+
+# load the forest before the first request (once in the master with gunicorn preload_app)
+from heart_app.forest import get_forest  # noqa: E402
+
+get_forest()
@@ -0,0 +1,423 @@
+"""Load test of the two prediction web apps.
+
+Boots ``heart_app`` or ``fake_news_app`` on localhost (``runserver`` or
+``gunicorn``), drives it with concurrent clients sending synthetic form
+payloads and reports requests per second, p50/p95/p99 latency and the RSS
+of every server process. Results are written as JSON so runs of different
+commits can be compared:
+
+    python benchmarks/loadtest.py heart --server gunicorn --workers 2 --clients 8
+    python benchmarks/loadtest.py fake_news --duration 30 --compare benchmarks/results/old.json
+
+The app folders are flattened Django packages, so the harness links them
+into a temporary directory under their package names and starts the server
+from inside the app folder (the pickled artifacts are loaded from there).
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+APPS = {
+    'heart': {'package': 'heart_app', 'directory': 'Web App for prediction of heart failure.'},
+    'fake_news': {'package': 'fake_news_app', 'directory': 'Web App for prediction of fake news'},
+}
+
+# form fields of heart_app's index.html with the ranges of the dataset
+HEART_FIELDS = [
+    ('age', 40, 95, False),
+    ('anaemia', 0, 1, True),
+    ('creatinine_phosphokinase', 23, 7861, True),
+    ('diabetes', 0, 1, True),
+    ('ejection_fraction', 14, 80, True),
+    ('high_blood_pressure', 0, 1, True),
+    ('platelets', 25100, 850000, False),
+    ('serum_creatinine', 0.5, 9.4, False),
+    ('serum_sodium', 113, 148, True),
+    ('sex', 0, 1, True),
+    ('smoking', 0, 1, True),
+]
+
+WORDS = ('the president said government election news report people state year new police week world '
+         'official health video house market trump clinton america court war military money city law '
+         'campaign media million white country security party vote support public statement plan').split()
+AUTHORS = ['Reuters', 'Jane Doe', 'John Smith', 'Editorial Board', 'Staff Writer', '']
+
+
+def heart_payloads(n, rng):
+    payloads = []
+    for _ in range(n):
+        params = {}
+        for name, low, high, integer in HEART_FIELDS:
+            params[name] = rng.randint(low, high) if integer else round(rng.uniform(low, high), 2)
+        payloads.append(('GET', '/result/?' + urllib.parse.urlencode(params), None))
+    return payloads
+
+
+def fake_news_payloads(n, rng, words=400):
+    payloads = []
+    for _ in range(n):
+        fields = {
+            'title': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 15))).capitalize(),
+            'author': rng.choice(AUTHORS),
+            'text': ' '.join(rng.choice(WORDS) for _ in range(max(1, int(rng.gauss(words, words / 4))))),
+        }
+        payloads.append(('POST', '/result/', urllib.parse.urlencode(fields).encode('utf-8')))
+    return payloads
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, server, port, workers, log):
+    """Start the app and return ``(process, shim directory)``."""
+    shim = tempfile.mkdtemp(prefix='loadtest-')
+    directory = os.path.join(ROOT, APPS[app]['directory'])
+    package = APPS[app]['package']
+    os.symlink(directory, os.path.join(shim, package))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [shim, env.get('PYTHONPATH')]))
+    env['DJANGO_SETTINGS_MODULE'] = package + '.settings'
+    env['PYTHONUNBUFFERED'] = '1'
+    address = '127.0.0.1:%d' % port
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', package + '.wsgi', '--bind', address,
+                   '--workers', str(workers), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'django', 'runserver', '--noreload', address]
+    process = subprocess.Popen(command, cwd=directory, env=env, stdout=log, stderr=subprocess.STDOUT,
+                               start_new_session=True)
+    return process, shim
+
+
+def wait_ready(process, port, timeout):
+    """Seconds until the server answers its first request."""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("server exited with code %d" % process.returncode)
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return time.monotonic() - started
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    raise RuntimeError("server did not answer on port %d within %ds" % (port, timeout))
+
+
+def stop_server(process, shim):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    shutil.rmtree(shim, ignore_errors=True)
+
+
+def process_tree(pid):
+    """``pid`` and all its descendants, read from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat' % entry) as f:
+                # the command name may contain spaces, the ppid follows the closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def rss_bytes(pid):
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    """Samples the RSS of the server processes while the load runs."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self._done = threading.Event()
+
+    def sample(self):
+        for pid in process_tree(self.pid):
+            rss = rss_bytes(pid)
+            if rss is not None:
+                self.last[pid] = rss
+                self.peak[pid] = max(rss, self.peak.get(pid, 0))
+
+    def run(self):
+        while not self._done.is_set():
+            self.sample()
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+class Client(threading.Thread):
+    """One keep-alive connection sending payloads round robin."""
+
+    def __init__(self, port, payloads, offset, deadline, budget, csrf):
+        super().__init__(daemon=True)
+        self.port = port
+        self.payloads = payloads
+        self.offset = offset
+        self.deadline = deadline
+        self.budget = budget
+        self.csrf = csrf
+        self.latencies = []
+        self.statuses = {}
+        self.errors = {}
+        self.conn = None
+
+    def connect(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        self.headers = {}
+        if self.csrf:
+            # the fake news form posts with a csrf token, take it from the home page
+            self.conn.request('GET', '/')
+            response = self.conn.getresponse()
+            response.read()
+            cookie = response.getheader('Set-Cookie', '')
+            token = cookie.split('csrftoken=', 1)[1].split(';', 1)[0] if 'csrftoken=' in cookie else ''
+            self.headers = {'Cookie': 'csrftoken=' + token, 'X-CSRFToken': token,
+                            'Content-Type': 'application/x-www-form-urlencoded'}
+            if response.will_close:
+                self.conn.close()
+
+    def run(self):
+        index = self.offset
+        self.connect()
+        while time.monotonic() < self.deadline and not self.budget.exhausted():
+            method, path, body = self.payloads[index % len(self.payloads)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                self.conn.request(method, path, body=body, headers=self.headers)
+                response = self.conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                name = type(e).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+                self.connect()
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+            if response.will_close:
+                self.conn.close()
+
+
+class Budget:
+    """Shared request counter of all clients, unlimited when ``total`` is None."""
+
+    def __init__(self, total):
+        self.total = total
+        self._lock = threading.Lock()
+
+    def exhausted(self):
+        if self.total is None:
+            return False
+        with self._lock:
+            if self.total <= 0:
+                return True
+            self.total -= 1
+            return False
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    # nearest rank
+    return ordered[max(0, math.ceil(q / 100.0 * len(ordered)) - 1)]
+
+
+def run_load(port, payloads, clients, duration, requests, csrf):
+    deadline = time.monotonic() + duration
+    budget = Budget(requests)
+    threads = [Client(port, payloads, i * len(payloads) // clients, deadline, budget, csrf)
+               for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for thread in threads for latency in thread.latencies)
+    statuses, errors = {}, {}
+    for thread in threads:
+        for status, count in thread.statuses.items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+        for name, count in thread.errors.items():
+            errors[name] = errors.get(name, 0) + count
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+        },
+        'status': statuses,
+        'errors': errors,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, previous):
+    print("compared with %s (commit %s):" % (previous.get('timestamp'), previous.get('commit')))
+    rows = [('rps', result['load']['rps'], previous['load']['rps'])]
+    for key in ('p50', 'p95', 'p99'):
+        rows.append((key + ' ms', result['load']['latency_ms'][key], previous['load']['latency_ms'][key]))
+    rows.append(('total rss MiB', result['rss']['total_mib'], previous['rss']['total_mib']))
+    for name, now, before in rows:
+        change = '' if not now or not before else '%+.1f%%' % ((now - before) / before * 100)
+        print("  %-14s %10s -> %10s  %s" % (name, before, now, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('app', choices=sorted(APPS))
+    parser.add_argument('--server', choices=['runserver', 'gunicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent connections")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument('--requests', type=int, default=None, help="stop after this many requests")
+    parser.add_argument('--warmup', type=float, default=3.0, help="seconds of load before measuring")
+    parser.add_argument('--payloads', type=int, default=1000, help="distinct synthetic payloads")
+    parser.add_argument('--words', type=int, default=400, help="mean words of a fake news text")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', default=None, help="JSON file, default benchmarks/results/")
+    parser.add_argument('--compare', default=None, help="JSON file of an earlier run")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    if args.app == 'heart':
+        payloads = heart_payloads(args.payloads, rng)
+    else:
+        payloads = fake_news_payloads(args.payloads, rng, args.words)
+    csrf = args.app == 'fake_news'
+    port = args.port or free_port()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = time.strftime('%Y%m%d-%H%M%S')
+    commit = git_commit()
+    name = '%s-%s-%s-%s' % (args.app, args.server, commit or 'nogit', timestamp)
+    log_path = os.path.join(RESULTS_DIR, name + '.log')
+    with open(log_path, 'wb') as log:
+        process, shim = start_server(args.app, args.server, port, args.workers, log)
+        try:
+            try:
+                startup = wait_ready(process, port, args.startup_timeout)
+            except RuntimeError as e:
+                sys.exit("%s, see %s" % (e, os.path.relpath(log_path, ROOT)))
+            if args.warmup > 0:
+                run_load(port, payloads, args.clients, args.warmup, None, csrf)
+            sampler = RssSampler(process.pid)
+            sampler.start()
+            load = run_load(port, payloads, args.clients, args.duration, args.requests, csrf)
+            sampler.stop()
+        finally:
+            stop_server(process, shim)
+
+    mib = lambda value: round(value / 2 ** 20, 1)
+    result = {
+        'app': args.app,
+        'server': args.server,
+        'workers': args.workers if args.server == 'gunicorn' else 1,
+        'clients': args.clients,
+        'payloads': args.payloads,
+        'seed': args.seed,
+        'commit': commit,
+        'timestamp': timestamp,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'startup_seconds': round(startup, 3),
+        'load': load,
+        'rss': {
+            # the first process is the gunicorn arbiter or runserver itself
+            'processes': [{'pid': pid, 'peak_mib': mib(sampler.peak[pid]), 'last_mib': mib(sampler.last[pid])}
+                          for pid in sorted(sampler.peak)],
+            'total_mib': mib(sum(sampler.peak.values())),
+        },
+        'log': os.path.relpath(log_path, ROOT),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, name + '.json')
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    latency = load['latency_ms']
+    print("%s on %s: %d requests in %.1fs, %.1f req/s, p50 %s ms, p95 %s ms, p99 %s ms, errors %s" % (
+        args.app, args.server, load['requests'], load['seconds'], load['rps'] or 0,
+        latency['p50'], latency['p95'], latency['p99'], load['errors'] or 'none'))
+    for process_rss in result['rss']['processes']:
+        print("  pid %(pid)d rss peak %(peak_mib)s MiB" % process_rss)
+    non_ok = {status: count for status, count in load['status'].items() if status != '200'}
+    if non_ok:
+        print("  non-200 responses: %s (see %s)" % (non_ok, result['log']))
+    print("saved %s" % os.path.relpath(output, ROOT))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
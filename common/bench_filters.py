@@ -0,0 +1,87 @@
+"""Chained ``data = data[...]`` filters versus one compiled mask on synthetic taxi trips.
+
+    python common/bench_filters.py --rows 10000000
+
+Reports the time, the frame copies and the peak of the memory allocated
+while filtering (tracemalloc, the input frame excluded).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from common import filter_spec
+
+# the predicates of ny_yellow_taxi_2019.py
+SPEC = [
+    ('PULocationID', '!=', 1),
+    ('DOLocationID', '!=', 1),
+    ('PULocationID', '<', 264),
+    ('DOLocationID', '<', 264),
+    ('RatecodeID', '==', 1),
+    ('fare_amount', '>', 0),
+    ('trip_distance', '>=', 0.5),
+    ('trip_distance', '<', 100),
+    ('fare_amount', '<', 150),
+    ('fare_amount', '>=', 2.5),
+    ('payment_type', '<=', 2),
+]
+
+
+def synthetic_trips(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'trip_distance': np.round(rng.exponential(4.5, rows), 2),
+        'RatecodeID': rng.choice([1, 1, 1, 1, 1, 1, 1, 1, 2, 5], rows),
+        'PULocationID': rng.integers(1, 266, rows),
+        'DOLocationID': rng.integers(1, 266, rows),
+        'payment_type': rng.choice([1, 1, 1, 2, 2, 3, 4], rows),
+        'fare_amount': np.round(rng.normal(13, 11, rows), 1),
+    })
+
+
+def chained(data):
+    for column, op, value in SPEC:
+        data = data[filter_spec.OPERATORS[op](data[column], value)]
+    return data
+
+
+def compiled(data):
+    keep, _ = filter_spec.compile_mask(data, SPEC)
+    return data[keep]
+
+
+def measure(function, data):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(data)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    data = synthetic_trips(args.rows)
+    print("%d rows, %.0f MiB" % (len(data), data.memory_usage().sum() / 2 ** 20))
+    expected, chained_seconds, chained_peak = measure(chained, data)
+    result, compiled_seconds, compiled_peak = measure(compiled, data)
+    pd.testing.assert_frame_equal(result, expected)
+    print("%-9s %8s %10s %10s" % ('', 'copies', 'seconds', 'peak MiB'))
+    print("%-9s %8d %10.2f %10.0f" % ('chained', len(SPEC), chained_seconds, chained_peak))
+    print("%-9s %8d %10.2f %10.0f" % ('compiled', 1, compiled_seconds, compiled_peak))
+    print("kept %d rows, %d copies saved, %.1fx faster"
+          % (len(result), len(SPEC) - 1, chained_seconds / compiled_seconds))
+
+
+if __name__ == '__main__':
+    main()
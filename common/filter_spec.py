@@ -0,0 +1,60 @@
+"""Declarative row filters shared by the rents and the taxi scripts.
+
+A spec is a list of ``(column, operator, value)`` predicates, e.g.::
+
+    [('baseRent', '<', 3000), ('RatecodeID', '==', 1), ('payment_type', 'in', [1, 2])]
+
+All predicates are combined into one boolean mask and the frame is
+indexed once, instead of one filtered copy per ``data = data[...]``.
+The comparisons are the pandas ones, so a missing value fails every
+predicate except ``!=``, as it did in the chained filters. The number of
+rows every predicate rejects is logged for data-quality monitoring.
+"""
+import logging
+import operator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'in': lambda column, values: column.isin(values),
+}
+
+
+def describe(predicate):
+    column, op, value = predicate
+    return '%s %s %r' % (column, op, value)
+
+
+def compile_mask(data, spec):
+    """``(keep, rejected)``: the boolean mask of the rows that pass every predicate of ``spec``
+    and the number of rows every predicate rejects on its own."""
+    keep = np.ones(len(data), dtype=bool)
+    rejected = []
+    for column, op, value in spec:
+        passed = np.asarray(OPERATORS[op](data[column], value), dtype=bool)
+        rejected.append(len(passed) - int(np.count_nonzero(passed)))
+        keep &= passed
+    return keep, rejected
+
+
+def report(name, spec, rows, kept, rejected):
+    """Log how many of ``rows`` rows were kept and what every predicate rejected."""
+    logger.info("%s: kept %d of %d rows (%.1f %%)", name, kept, rows, kept / rows * 100 if rows else 100.0)
+    for predicate, count in zip(spec, rejected):
+        logger.info("  %-32s rejects %d", describe(predicate), count)
+
+
+def apply(data, spec, name='rows'):
+    """The rows of ``data`` that pass every predicate, materialized once."""
+    keep, rejected = compile_mask(data, spec)
+    kept = int(np.count_nonzero(keep))
+    report(name, spec, len(data), kept, rejected)
+    return data[keep]